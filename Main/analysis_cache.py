@@ -0,0 +1,127 @@
+# analysis_cache.py
+"""Persistent position cache for the offline AI (SQLite).
+
+One row per (zobrist hash, depth): the score and best move find_ai_move
+found at that depth. Rows are kept per depth so an Easy game never gets
+a Hard answer; a shallower row still helps a deeper search by putting its
+best move first. The database is opened on first use, not at import.
+
+    ANALYSIS_CACHE=path         file to use (empty string disables the cache);
+                                default analysis_cache.sqlite in user_data.DATA_DIR
+    ANALYSIS_CACHE_MAX=200000   rows kept; least recently used go first
+"""
+import os, time, sqlite3
+import chess
+import chess.polyglot
+
+from user_data import DATA_DIR
+
+CACHE_PATH = os.getenv("ANALYSIS_CACHE", os.path.join(DATA_DIR, "analysis_cache.sqlite"))
+CACHE_MAX = int(os.getenv("ANALYSIS_CACHE_MAX", "200000"))
+EVICT_TO = 0.9             # eviction trims down to this fraction of CACHE_MAX
+EVICT_CHECK_EVERY = 256    # inserts between size checks
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    key   INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    move  TEXT    NOT NULL,
+    used  REAL    NOT NULL,
+    PRIMARY KEY (key, depth)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS positions_used ON positions (used);
+"""
+
+def _key(board: chess.Board) -> int:
+    # SQLite integers are signed 64-bit
+    h = chess.polyglot.zobrist_hash(board)
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+class AnalysisCache:
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX):
+        self.path = path
+        self.max_entries = max_entries
+        self.db = None
+        self.hits = 0
+        self.misses = 0
+        self._inserts = 0
+        self._broken = not path
+
+    def _open(self):
+        if self.db is None and not self._broken:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self.db = sqlite3.connect(self.path)
+                self.db.executescript(SCHEMA)
+            except (OSError, sqlite3.Error) as e:
+                print("[cache] disabled:", e)
+                self.db, self._broken = None, True
+        return self.db
+
+    def lookup(self, board: chess.Board, depth):
+        """(score, move) stored at exactly `depth`, else (None, best move from
+        the deepest shallower row, or None)."""
+        db = self._open()
+        if db is None:
+            return None, None
+        key = _key(board)
+        try:
+            row = db.execute(
+                "SELECT depth, score, move FROM positions WHERE key = ? AND depth <= ? "
+                "ORDER BY depth DESC LIMIT 1", (key, depth)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None, None
+            d, score, uci = row
+            mv = chess.Move.from_uci(uci)
+            if mv not in board.legal_moves:   # hash collision
+                self.misses += 1
+                return None, None
+            if d != depth:
+                self.misses += 1
+                return None, mv
+            self.hits += 1
+            db.execute("UPDATE positions SET used = ? WHERE key = ? AND depth = ?", (time.time(), key, d))
+            db.commit()
+            return score, mv
+        except sqlite3.Error as e:
+            print("[cache] lookup failed:", e)
+            return None, None
+
+    def store(self, board: chess.Board, depth, score, move: chess.Move):
+        db = self._open()
+        if db is None:
+            return
+        try:
+            db.execute("INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?)",
+                       (_key(board), depth, score, move.uci(), time.time()))
+            self._inserts += 1
+            if self._inserts % EVICT_CHECK_EVERY == 0:
+                self.evict()
+            db.commit()
+        except sqlite3.Error as e:
+            print("[cache] store failed:", e)
+
+    def evict(self):
+        """Drop least recently used rows once the table is over max_entries."""
+        db = self._open()
+        if db is None:
+            return 0
+        count = db.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+        if count <= self.max_entries:
+            return 0
+        drop = count - int(self.max_entries * EVICT_TO)
+        db.execute("DELETE FROM positions WHERE (key, depth) IN "
+                   "(SELECT key, depth FROM positions ORDER BY used LIMIT ?)", (drop,))
+        db.commit()
+        return drop
+
+    def close(self):
+        if self.db is not None:
+            try:
+                self.evict()
+            except sqlite3.Error:
+                pass
+            self.db.close()
+            self.db = None
@@ -0,0 +1,92 @@
+# board_view.py
+"""Board geometry and scaled layers for a resizable window.
+
+The board art is laid out for an 800x800 window: squares are 84 px and
+a1-h8 starts at (55, 60). BoardView scales that layout to the largest
+square that fits the window, centred, and keeps the board and piece
+images pre-scaled to match. After a resize the layers are rebuilt once
+with a fast scale, and the smoothscale pass waits until the window has
+stopped changing size for RESIZE_DEBOUNCE_MS.
+"""
+import pygame
+import chess
+
+REF_SIZE = 800              # window size the board art was measured at
+REF_TILE = 84
+REF_OFFSET = (55, 60)
+REF_TWEAK_Y = 5             # pieces sit slightly low in their squares
+PIECE_SCALE = 0.9
+RESIZE_DEBOUNCE_MS = 150
+
+class BoardView:
+    def __init__(self, board_img, piece_imgs, size):
+        """`board_img` and `piece_imgs` are the unscaled source images."""
+        self.src_board = board_img
+        self.src_pieces = piece_imgs
+        self._smooth_at = None
+        self.resize(size, smooth=True)
+
+    def resize(self, size, smooth=False):
+        w, h = size
+        self.size = (w, h)
+        self.scale = min(w, h) / REF_SIZE
+        self.side = max(1, round(REF_SIZE * self.scale))
+        self.origin = ((w - self.side) // 2, (h - self.side) // 2)
+        self.tile = REF_TILE * self.scale
+        self.offset_x = self.origin[0] + REF_OFFSET[0] * self.scale
+        self.offset_y = self.origin[1] + REF_OFFSET[1] * self.scale
+        self._build(smooth)
+        self._smooth_at = None if smooth else pygame.time.get_ticks() + RESIZE_DEBOUNCE_MS
+
+    def _build(self, smooth):
+        scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+        self.board_layer = scale(self.src_board, (self.side, self.side))
+        px = max(1, int(self.tile * PIECE_SCALE))
+        self.pieces = {k: scale(img, (px, px)) for k, img in self.src_pieces.items()}
+
+    def handle_event(self, event):
+        """Follow window resizes; returns True if the event was one."""
+        if event.type != pygame.VIDEORESIZE:
+            return False
+        self.resize(pygame.display.get_surface().get_size())
+        return True
+
+    def update(self):
+        """Call once per frame: picks up resizes that happened while another
+        screen had the event queue, and does the deferred smoothscale."""
+        surface = pygame.display.get_surface()
+        if surface is not None and surface.get_size() != self.size:
+            self.resize(surface.get_size())
+        if self._smooth_at is not None and pygame.time.get_ticks() >= self._smooth_at:
+            self._build(True)
+            self._smooth_at = None
+
+    # --- geometry ---
+    def px(self, n):
+        """A length measured on the 800 px layout, in window pixels."""
+        return max(1, round(n * self.scale))
+
+    def square_rect(self, sq):
+        col, row = chess.square_file(sq), 7 - chess.square_rank(sq)
+        x0 = round(self.offset_x + col * self.tile)
+        y0 = round(self.offset_y + row * self.tile)
+        x1 = round(self.offset_x + (col + 1) * self.tile)
+        y1 = round(self.offset_y + (row + 1) * self.tile)
+        return pygame.Rect(x0, y0, x1 - x0, y1 - y0)
+
+    def square_center(self, sq):
+        return self.square_rect(sq).center
+
+    def square_at(self, pos):
+        """Square under a window position, or None off the board."""
+        col = int((pos[0] - self.offset_x) // self.tile)
+        row = int((pos[1] - self.offset_y) // self.tile)
+        if 0 <= col < 8 and 0 <= row < 8:
+            return chess.square(col, 7 - row)
+        return None
+
+    def piece_pos(self, sq, img):
+        """Top-left corner for blitting `img` centred in `sq`."""
+        r = self.square_rect(sq)
+        return (r.x + (r.w - img.get_width()) // 2,
+                r.y + (r.h - img.get_height()) // 2 + self.px(REF_TWEAK_Y))
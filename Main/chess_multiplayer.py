@@ -1,5 +1,5 @@
 # chess_multiplayer.py
-import os, sys, json, asyncio, random, string, queue
+import os, sys, json, time, asyncio, random, string, queue
 import pygame
 import chess
 from threading import Thread
@@ -8,10 +8,14 @@ from aiohttp import ClientSession, WSMsgType
 from aiortc import (
     RTCPeerConnection,
     RTCSessionDescription,
-    RTCIceCandidate,
     RTCConfiguration,
     RTCIceServer,
 )
+from aiortc.sdp import candidate_from_sdp, candidate_to_sdp
+
+from game_log import start_log
+from frame_profiler import FrameProfiler
+from board_view import BoardView
 
 # ====================== Options ======================
 # If True: either player may move their own pieces at any time (useful for testing).
@@ -19,12 +23,8 @@ from aiortc import (
 SANDBOX = False
 
 # ---------- Board & assets ----------
-WIDTH, HEIGHT = 800, 800
+WIDTH, HEIGHT = 800, 800   # initial window size; the window can be resized
 FPS = 60
-TILE_W, TILE_H = 84, 84
-OFFSET_X, OFFSET_Y = 55, 60
-PIECE_SCALE = 0.9
-TWEAK_X, TWEAK_Y = 0, 5
 
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
 PIECES_DIR = os.path.join(ASSETS_DIR, "pieces")
@@ -46,10 +46,23 @@ if TURN_URL and TURN_USER and TURN_PASS:
 
 RTC_CONFIG = RTCConfiguration(iceServers=ICE_SERVERS)
 
+# Pre-warm: create the peer connection, gather ICE and open the signaling
+# session as soon as the multiplayer screen opens, not after the room code.
+PREWARM = os.getenv("PREWARM", "1") != "0"
+# "bundled": candidates ride inside the offer/answer SDP (one message).
+# "trickle": SDP is sent immediately, candidates follow as separate messages.
+ICE_MODE = os.getenv("ICE_MODE", "bundled").lower()
+
+# ---------- Spectator broadcast ----------
+# If set, the host publishes the game so others can watch it (W on the lobby screen).
+BROADCAST = os.getenv("BROADCAST", "0") == "1"
+# Full-position snapshot every N plies; late viewers replay at most N moves.
+SNAPSHOT_EVERY = 16
+
 # ====================== UI helpers ======================
 def center_text(surf, text, y, font, color=(255,255,255)):
     t = font.render(text, True, color)
-    r = t.get_rect(center=(WIDTH//2, y))
+    r = t.get_rect(center=(surf.get_width()//2, y))
     surf.blit(t, r)
 
 def random_room_code(n=5):
@@ -60,8 +73,10 @@ def ask_host_or_join(screen):
     font_small= pygame.font.SysFont("arial", 22)
     while True:
         screen.fill((15,18,22))
-        center_text(screen, "Press  H  to Host   or   J  to Join", HEIGHT//2, font_big)
-        center_text(screen, "ESC to cancel", HEIGHT//2 + 60, font_small, (180,180,180))
+        cy = screen.get_height()//2
+        center_text(screen, "Press  H  to Host   or   J  to Join", cy, font_big)
+        center_text(screen, "W  to Watch a broadcast game", cy + 40, font_small)
+        center_text(screen, "ESC to cancel", cy + 90, font_small, (180,180,180))
         pygame.display.flip()
         for e in pygame.event.get():
             if e.type == pygame.QUIT: return None
@@ -69,6 +84,7 @@ def ask_host_or_join(screen):
                 if e.key == pygame.K_ESCAPE: return None
                 if e.key == pygame.K_h: return "host"
                 if e.key == pygame.K_j: return "join"
+                if e.key == pygame.K_w: return "watch"
 
 def ask_room_code(screen):
     font = pygame.font.SysFont("arial", 28)
@@ -77,7 +93,7 @@ def ask_room_code(screen):
     while True:
         screen.fill((15,18,22))
         center_text(screen, "Enter ROOM CODE:", 220, font)
-        box = pygame.Rect(WIDTH//2 - 160, 270, 320, 46)
+        box = pygame.Rect(screen.get_width()//2 - 160, 270, 320, 46)
         pygame.draw.rect(screen, (40,45,52), box, border_radius=10)
         pygame.draw.rect(screen, (100,110,120), box, 2, border_radius=10)
         txt = font.render(code, True, (220,220,220))
@@ -99,6 +115,7 @@ def ask_room_code(screen):
 
 # ====================== Board / Drawing ======================
 def load_piece_images():
+    """Unscaled piece images; BoardView keeps the scaled copies."""
     pieces = {}
     fmap = {"P":"Pawn","R":"Rook","N":"Knight","B":"Bishop","Q":"Queen","K":"King"}
     for c in ["w","b"]:
@@ -107,45 +124,54 @@ def load_piece_images():
             pth = os.path.join(PIECES_DIR, f"{c}_{name}.png")
             if not os.path.exists(pth):
                 raise FileNotFoundError(pth)
-            img = pygame.image.load(pth).convert_alpha()
-            img = pygame.transform.smoothscale(img, (int(TILE_W*PIECE_SCALE), int(TILE_H*PIECE_SCALE)))
-            pieces[key] = img
+            pieces[key] = pygame.image.load(pth).convert_alpha()
     return pieces
 
-def draw_board(screen, board_img):
-    screen.blit(board_img, (0,0))
+def load_board_view(size=(WIDTH, HEIGHT)):
+    board_img = pygame.image.load(os.path.join(ASSETS_DIR, "board", "chess_board.png")).convert()
+    return BoardView(board_img, load_piece_images(), size)
 
-def draw_pieces(screen, board, piece_images):
+def draw_board(screen, view):
+    if screen.get_size() != (view.side, view.side):
+        screen.fill((15,18,22))
+    screen.blit(view.board_layer, view.origin)
+
+def draw_pieces(screen, board, view):
     for sq, piece in board.piece_map().items():
-        row = 7 - (sq // 8); col = sq % 8
         key = ("w" if piece.color == chess.WHITE else "b") + piece.symbol().upper()
-        img = piece_images[key]
-        rect = pygame.Rect(OFFSET_X + col*TILE_W, OFFSET_Y + row*TILE_H, TILE_W, TILE_H)
-        x = rect.x + (TILE_W - img.get_width()) // 2 + TWEAK_X
-        y = rect.y + (TILE_H - img.get_height()) // 2 + TWEAK_Y
-        screen.blit(img, (x, y))
+        img = view.pieces[key]
+        screen.blit(img, view.piece_pos(sq, img))
 
-def highlight_moves(screen, board, selected_square):
+def highlight_moves(screen, board, selected_square, view):
     if selected_square is None: return
     for mv in [m for m in board.legal_moves if m.from_square == selected_square]:
-        row = 7 - (mv.to_square // 8); col = mv.to_square % 8
-        center = (OFFSET_X + col*TILE_W + TILE_W//2, OFFSET_Y + row*TILE_H + TILE_H//2)
-        pygame.draw.circle(screen, (0,255,0), center, 12)
-
-def promotion_menu(screen, color, piece_images):
+        pygame.draw.circle(screen, (0,255,0), view.square_center(mv.to_square), view.px(12))
+
+def draw_premoves(screen, premoves, view):
+    if not premoves: return
+    for mv in premoves:
+        for sq in (mv.from_square, mv.to_square):
+            r = view.square_rect(sq)
+            shade = pygame.Surface(r.size, pygame.SRCALPHA)
+            shade.fill((200, 60, 60, 90))
+            screen.blit(shade, r.topleft)
+
+def promotion_menu(screen, color, view):
     choices = [chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT]
     labels  = ["Q","R","B","N"]
-    overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+    w, h = screen.get_size()
+    tile = round(view.tile)
+    overlay = pygame.Surface((w, h), pygame.SRCALPHA)
     overlay.fill((0,0,0,180)); screen.blit(overlay, (0,0))
     menu = []
-    sx = WIDTH//2 - (len(choices)*TILE_W)//2
-    y  = HEIGHT//2 - TILE_H//2
+    sx = w//2 - (len(choices)*tile)//2
+    y  = h//2 - tile//2
     for i,ch in enumerate(choices):
-        r = pygame.Rect(sx + i*(TILE_W+10), y, TILE_W, TILE_H)
+        r = pygame.Rect(sx + i*(tile+10), y, tile, tile)
         key = ("w" if color==chess.WHITE else "b")+labels[i]
-        img = piece_images[key]
-        xx = r.x + (TILE_W - img.get_width())//2
-        yy = r.y + (TILE_H - img.get_height())//2
+        img = view.pieces[key]
+        xx = r.x + (tile - img.get_width())//2
+        yy = r.y + (tile - img.get_height())//2
         screen.blit(img,(xx,yy))
         menu.append((r,ch))
     pygame.display.flip()
@@ -161,10 +187,30 @@ def _start_loop(loop: asyncio.AbstractEventLoop):
     asyncio.set_event_loop(loop)
     loop.run_forever()
 
-async def _webrtc_connect(signal_url: str, is_host: bool, inbound_q: "queue.Queue[str]"):
-    print("[webrtc] signaling url:", signal_url)
-    print("[webrtc] role:", "host" if is_host else "join")
-    print("[webrtc] ICE servers:", [s.urls for s in RTC_CONFIG.iceServers])
+def _ms(t0, t1=None):
+    return int(((t1 if t1 is not None else time.perf_counter()) - t0) * 1000)
+
+def _candidate_json(c):
+    if c is None:
+        return {"type": "candidate", "candidate": None}
+    return {
+        "type": "candidate",
+        "candidate": {
+            "sdpMid": c.sdpMid,
+            "sdpMLineIndex": c.sdpMLineIndex,
+            "candidate": "candidate:" + candidate_to_sdp(c),
+        }
+    }
+
+async def _webrtc_prewarm(http_base, inbound_q: "queue.Queue[str]"):
+    """Do all the role-independent connection work up front: peer connection,
+    data channel, ICE gathering and the HTTP session to the signaling server.
+    Runs while the user is still picking host/join or typing the room code.
+    With no `http_base` (PREWARM=0, called after the room code) the server
+    isn't pinged: ws_connect opens that connection itself."""
+    warm = {"t0": time.perf_counter(), "gather_done": None, "http_done": None,
+            "t_connect": None, "early": False}
+    print("[webrtc] pre-warm start, ICE servers:", [s.urls for s in RTC_CONFIG.iceServers])
 
     pc = RTCPeerConnection(configuration=RTC_CONFIG)
 
@@ -185,11 +231,6 @@ async def _webrtc_connect(signal_url: str, is_host: bool, inbound_q: "queue.Queu
     def _on_sig_state():
         print("[webrtc] signaling state:", pc.signalingState)
 
-    session = ClientSession()
-    ws = await session.ws_connect(signal_url, heartbeat=20)
-
-    channel_box = {"ch": None}
-
     def _push_inbound(msg):
         try:
             if isinstance(msg, bytes):
@@ -199,23 +240,106 @@ async def _webrtc_connect(signal_url: str, is_host: bool, inbound_q: "queue.Queu
         except Exception as e:
             print("[dc] inbound queue error:", e)
 
-    @pc.on("datachannel")
-    def on_datachannel(ch):
-        print("[dc] joiner got datachannel:", ch.label)
-        channel_box["ch"] = ch
+    # Negotiated channel: both sides create it before knowing their role, so
+    # the SCTP/DTLS/ICE transports (and their gatherer) exist right away.
+    ch = pc.createDataChannel("chess", negotiated=True, id=0)
+    channel_box = {"ch": ch}
+
+    @ch.on("open")
+    def _open():
+        open_flag["open"] = True
+        t_open = time.perf_counter()
+        if warm["t_connect"] is not None and warm["early"]:
+            # Setup work that finished (or ran) before the room code was chosen
+            ready = max(warm["gather_done"] or t_open, warm["http_done"] or t_open)
+            saved = _ms(warm["t0"], min(ready, warm["t_connect"]))
+            print(f"[webrtc] datachannel open {_ms(warm['t_connect'], t_open)} ms after room code "
+                  f"(pre-warm saved ~{saved} ms)")
+        elif warm["t_connect"] is not None:
+            print(f"[webrtc] datachannel open {_ms(warm['t_connect'], t_open)} ms after room code")
+        else:
+            print("[dc] datachannel open")
+        try:
+            ch.send("__hello__")
+        except Exception:
+            pass
+
+    @ch.on("message")
+    def _msg(m):
+        _push_inbound(m)
 
-        @ch.on("open")
-        def _open():
-            print("[dc] joiner datachannel open")
-            open_flag["open"] = True
-            try:
-                ch.send("__hello_from_joiner__")
-            except Exception:
-                pass
+    ice_transport = pc.sctp.transport.transport
+    gatherer = ice_transport.iceGatherer
+
+    async def _gather():
+        await gatherer.gather()
+        warm["gather_done"] = time.perf_counter()
+        print(f"[webrtc] ICE gathering complete in {_ms(warm['t0'], warm['gather_done'])} ms "
+              f"({len(gatherer.getLocalCandidates())} candidates)")
+
+    gather_task = asyncio.ensure_future(_gather())
+
+    # Open a pooled keep-alive connection to the signaling server; ws_connect
+    # reuses it later instead of paying DNS + TCP setup after the room code.
+    session = ClientSession()
+    if http_base:
+        try:
+            async with session.get(f"{http_base}/stats") as resp:
+                await resp.read()
+            warm["http_done"] = time.perf_counter()
+            print(f"[webrtc] signaling server reachable ({_ms(warm['t0'], warm['http_done'])} ms)")
+        except Exception as e:
+            print("[webrtc] pre-warm: signaling server not reachable yet:", e)
+
+    async def closer():
+        gather_task.cancel()
+        await session.close()
+        await pc.close()
 
-        @ch.on("message")
-        def _msg(m):
-            _push_inbound(m)
+    warm.update(pc=pc, session=session, channel_box=channel_box, open_flag=open_flag,
+                ice_transport=ice_transport, gather_task=gather_task, closer=closer)
+    return warm
+
+async def _webrtc_connect(signal_url: str, is_host: bool, inbound_q: "queue.Queue[str]", warm_fut=None):
+    print("[webrtc] signaling url:", signal_url)
+    print("[webrtc] role:", "host" if is_host else "join", "| ICE mode:", ICE_MODE)
+
+    if warm_fut is not None:
+        warm = await asyncio.wrap_future(warm_fut)
+        warm["early"] = True
+    else:
+        warm = await _webrtc_prewarm(None, inbound_q)
+    warm["t_connect"] = time.perf_counter()
+
+    pc, session = warm["pc"], warm["session"]
+    channel_box, open_flag = warm["channel_box"], warm["open_flag"]
+    gather_task = warm["gather_task"]
+    gatherer = warm["ice_transport"].iceGatherer
+
+    ws = await session.ws_connect(signal_url, heartbeat=20)
+    local_set = asyncio.Event()
+
+    async def send_local(desc):
+        """Send our offer/answer. Bundled: wait for gathering and ship the
+        candidates inside the SDP. Trickle: send the SDP now if gathering is
+        still running, then each candidate as its own message."""
+        if ICE_MODE == "trickle" and not gather_task.done():
+            print(f"[ws] sending {desc.type} (trickle)")
+            await ws.send_json({"type": desc.type, "sdp": desc.sdp})
+            await gather_task
+            await pc.setLocalDescription(desc)
+            local_set.set()
+            for c in gatherer.getLocalCandidates():
+                c.sdpMid = pc.sctp.mid
+                c.sdpMLineIndex = 0
+                await ws.send_json(_candidate_json(c))
+            await ws.send_json(_candidate_json(None))
+        else:
+            await gather_task
+            await pc.setLocalDescription(desc)
+            local_set.set()
+            print(f"[ws] sending {desc.type}")
+            await ws.send_json({"type": desc.type, "sdp": pc.localDescription.sdp})
 
     async def ws_reader():
         async for msg in ws:
@@ -226,72 +350,132 @@ async def _webrtc_connect(signal_url: str, is_host: bool, inbound_q: "queue.Queu
             if typ == "offer":
                 print("[ws] got offer")
                 await pc.setRemoteDescription(RTCSessionDescription(data["sdp"], "offer"))
-                answer = await pc.createAnswer()
-                await pc.setLocalDescription(answer)
-                print("[ws] sending answer")
-                await ws.send_json({"type":"answer", "sdp": pc.localDescription.sdp})
+                await send_local(await pc.createAnswer())
             elif typ == "answer":
                 print("[ws] got answer")
+                await local_set.wait()
                 await pc.setRemoteDescription(RTCSessionDescription(data["sdp"], "answer"))
             elif typ == "candidate":
-                print("[ws] got candidate")
-                c = data["candidate"]
+                c = data.get("candidate")
                 try:
-                    await pc.addIceCandidate(RTCIceCandidate(
-                        sdpMid=c.get("sdpMid"),
-                        sdpMLineIndex=c.get("sdpMLineIndex"),
-                        candidate=c.get("candidate"),
-                    ))
+                    if c is None:
+                        print("[ws] remote candidates complete")
+                        await warm["ice_transport"].addRemoteCandidate(None)
+                        continue
+                    print("[ws] got candidate")
+                    cand = candidate_from_sdp(c["candidate"].split(":", 1)[1])
+                    cand.sdpMid = c.get("sdpMid")
+                    cand.sdpMLineIndex = c.get("sdpMLineIndex")
+                    await pc.addIceCandidate(cand)
                 except Exception as e:
                     print("[ws] addIceCandidate error:", e)
 
     asyncio.create_task(ws_reader())
 
-    @pc.on("icecandidate")
-    async def on_icecandidate(event):
-        if event.candidate:
-            print("[ws] sending candidate")
-            await ws.send_json({
-                "type": "candidate",
-                "candidate": {
-                    "sdpMid": event.candidate.sdpMid,
-                    "sdpMLineIndex": event.candidate.sdpMLineIndex,
-                    "candidate": event.candidate.to_sdp(),
-                }
-            })
-        else:
-            print("[webrtc] ICE gathering complete")
-
     if is_host:
-        ch = pc.createDataChannel("chess")
-        channel_box["ch"] = ch
-        print("[dc] host created datachannel")
+        await send_local(await pc.createOffer())
 
-        @ch.on("open")
-        def _open():
-            print("[dc] host datachannel open")
-            open_flag["open"] = True
-            try:
-                ch.send("__hello_from_host__")
-            except Exception:
-                pass
+    async def closer():
+        try: await ws.close()
+        except: pass
+        await warm["closer"]()
+
+    return pc, channel_box, closer, open_flag
 
-        @ch.on("message")
-        def on_message(msg):
-            _push_inbound(msg)
+def _close_warm(warm_fut, loop):
+    """Tear down a pre-warmed connection the user never used."""
+    if warm_fut is None:
+        return
+    try:
+        warm = warm_fut.result(timeout=3)
+        asyncio.run_coroutine_threadsafe(warm["closer"](), loop).result(timeout=3)
+    except Exception:
+        pass
 
-        offer = await pc.createOffer()
-        await pc.setLocalDescription(offer)
-        print("[ws] sending offer")
-        await ws.send_json({"type":"offer", "sdp": pc.localDescription.sdp})
+# ====================== Spectator broadcast ======================
+def _compact(obj):
+    return json.dumps(obj, separators=(",", ":"))
+
+def snapshot_frame(board: chess.Board):
+    return _compact({"type": "snapshot", "ply": board.ply(), "fen": board.fen()})
+
+def broadcast_frames(board: chess.Board):
+    """Frames to publish after the move just pushed on `board`: the move
+    delta, plus a fresh snapshot every SNAPSHOT_EVERY plies."""
+    frames = [_compact({"type": "move", "ply": board.ply(), "uci": board.peek().uci()})]
+    if board.ply() % SNAPSHOT_EVERY == 0:
+        frames.append(snapshot_frame(board))
+    return frames
+
+def apply_broadcast_frame(board, ply, data):
+    """Apply one snapshot/move frame; returns the (possibly new) board and
+    its ply, or ply None while no snapshot has been seen yet."""
+    try:
+        f = json.loads(data)
+        if f.get("type") == "snapshot":
+            return chess.Board(f["fen"]), f["ply"]
+        if f.get("type") == "move" and ply is not None and f["ply"] == ply + 1:
+            board.push_uci(f["uci"])
+            return board, ply + 1
+    except Exception as e:
+        print("[watch] bad frame:", e)
+    return board, ply
+
+async def _ws_open(url):
+    session = ClientSession()
+    ws = await session.ws_connect(url, heartbeat=20)
 
     async def closer():
         try: await ws.close()
         except: pass
         await session.close()
-        await pc.close()
 
-    return pc, channel_box, closer, open_flag
+    return ws, closer
+
+async def _watch(url, frames_q: "queue.Queue[str]"):
+    ws, closer = await _ws_open(url)
+    try:
+        async for msg in ws:
+            if msg.type == WSMsgType.TEXT:
+                frames_q.put_nowait(msg.data)
+    finally:
+        await closer()
+
+def run_spectator(screen, clock, room, view, loop):
+    url = f"ws://{SIGNAL_HOST}:{SIGNAL_PORT}/watch?game={room}"
+    print("[watch] url:", url)
+    frames_q: "queue.Queue[str]" = queue.Queue()
+    fut = asyncio.run_coroutine_threadsafe(_watch(url, frames_q), loop)
+
+    font = pygame.font.SysFont("arial", 28)
+    board, ply = chess.Board(), None
+    while True:
+        for e in pygame.event.get():
+            view.handle_event(e)
+            if e.type == pygame.QUIT or (e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE):
+                fut.cancel()
+                return
+
+        while True:
+            try:
+                data = frames_q.get_nowait()
+            except queue.Empty:
+                break
+            board, ply = apply_broadcast_frame(board, ply, data)
+
+        if ply is None:
+            screen.fill((15,18,22))
+            center_text(screen, f"Watching room {room}", 260, font, (100,200,255))
+            if fut.done():
+                center_text(screen, "Could not reach the broadcast", 320, font)
+            else:
+                center_text(screen, "Waiting for the game...", 320, font)
+        else:
+            view.update()
+            draw_board(screen, view)
+            draw_pieces(screen, board, view)
+        pygame.display.flip()
+        clock.tick(30)
 
 # ====================== Game helpers ======================
 def try_push_move(board: chess.Board, mv: chess.Move, my_color: bool):
@@ -310,6 +494,51 @@ def try_push_move(board: chess.Board, mv: chess.Move, my_color: bool):
         return True
     return False
 
+def premove_board(board: chess.Board, premoves):
+    """`board` with the queued premoves applied as plain piece moves (no
+    legality), used to see which piece a further premove would move."""
+    b = board.copy(stack=False)
+    for mv in premoves:
+        piece = b.remove_piece_at(mv.from_square)
+        if piece and mv.promotion:
+            piece = chess.Piece(mv.promotion, piece.color)
+        b.set_piece_at(mv.to_square, piece)
+    return b
+
+def premove_shape_ok(pos: chess.Board, from_sq: int, to_sq: int):
+    """Could the piece on `from_sq` in `pos` ever make this move? Only its
+    movement pattern counts: squares in the way may be cleared, and empty
+    ones filled, by the time the premove is played."""
+    piece = pos.piece_at(from_sq)
+    if piece is None or from_sq == to_sq:
+        return False
+    df = chess.square_file(to_sq) - chess.square_file(from_sq)
+    dr = chess.square_rank(to_sq) - chess.square_rank(from_sq)
+    if piece.piece_type == chess.PAWN:
+        fwd = 1 if piece.color == chess.WHITE else -1
+        home = 1 if piece.color == chess.WHITE else 6
+        return (dr == fwd and abs(df) <= 1) or (
+            df == 0 and dr == 2 * fwd and chess.square_rank(from_sq) == home)
+    if piece.piece_type == chess.KING and dr == 0 and abs(df) == 2:
+        # Castling, from the king's own start square
+        return from_sq == (chess.E1 if piece.color == chess.WHITE else chess.E8)
+    empty = chess.BaseBoard.empty()
+    empty.set_piece_at(from_sq, piece)
+    return to_sq in empty.attacks(from_sq)
+
+def try_premove(board: chess.Board, premoves, my_color: bool):
+    """Play the first queued premove once it is our turn. If it is no longer
+    legal it is discarded along with the rest of the queue, which was
+    planned on top of it. Returns the move played, or None."""
+    if not premoves or board.turn != my_color:
+        return None
+    mv = premoves.pop(0)
+    if try_push_move(board, mv, my_color):
+        return mv
+    print("[game] premove no longer legal, discarding:", mv.uci(), [m.uci() for m in premoves])
+    premoves.clear()
+    return None
+
 def apply_inbound_uci(board: chess.Board, uci: str):
     try:
         mv = chess.Move.from_uci(uci)
@@ -326,7 +555,7 @@ def apply_inbound_uci(board: chess.Board, uci: str):
 # ====================== Main entry ======================
 def run():
     pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
     pygame.display.set_caption("Chess Multiplayer (aiortc)")
     clock = pygame.time.Clock()
 
@@ -344,28 +573,48 @@ def run():
     except Exception:
         pass
 
+    # Thread-safe inbox fed by the asyncio thread
+    inbound_q: "queue.Queue[str]" = queue.Queue()
+
+    # Run asyncio loop in background
+    loop = asyncio.new_event_loop()
+    thread = Thread(target=_start_loop, args=(loop,), daemon=True)
+    thread.start()
+
+    # Start connection setup now so it overlaps with the host/join choice
+    warm_fut = None
+    if PREWARM:
+        warm_fut = asyncio.run_coroutine_threadsafe(
+            _webrtc_prewarm(f"http://{SIGNAL_HOST}:{SIGNAL_PORT}", inbound_q), loop
+        )
+
+    # Board and pieces load here while the asyncio thread does the handshake
+    view = load_board_view(screen.get_size())
+
     role = ask_host_or_join(screen)
     if role is None:
+        _close_warm(warm_fut, loop)
         pygame.quit(); return
 
     if role == "host":
         room = random_room_code()
     else:
         room = ask_room_code(screen)
-        if not room: pygame.quit(); return
+        if not room:
+            _close_warm(warm_fut, loop)
+            pygame.quit(); return
+
+    if role == "watch":
+        _close_warm(warm_fut, loop)
+        run_spectator(screen, clock, room, view, loop)
+        try: loop.call_soon_threadsafe(loop.stop)
+        except: pass
+        pygame.quit(); return
 
     signal_url = f"ws://{SIGNAL_HOST}:{SIGNAL_PORT}/ws?room={room}"
 
-    # Thread-safe inbox fed by the asyncio thread
-    inbound_q: "queue.Queue[str]" = queue.Queue()
-
-    # Run asyncio loop in background
-    loop = asyncio.new_event_loop()
-    thread = Thread(target=_start_loop, args=(loop,), daemon=True)
-    thread.start()
-
     fut = asyncio.run_coroutine_threadsafe(
-        _webrtc_connect(signal_url, role=="host", inbound_q=inbound_q), loop
+        _webrtc_connect(signal_url, role=="host", inbound_q=inbound_q, warm_fut=warm_fut), loop
     )
     pc = chan_box = closer = open_flag = None
 
@@ -376,6 +625,8 @@ def run():
                 if closer:
                     try: asyncio.run_coroutine_threadsafe(closer(), loop).result(timeout=3)
                     except: pass
+                else:
+                    _close_warm(warm_fut, loop)
                 pygame.quit(); return
 
         if pc is None and fut.done():
@@ -402,53 +653,93 @@ def run():
     # Real channel (we send moves with it)
     chan = chan_box["ch"]
 
-    board_img = pygame.image.load(os.path.join(ASSETS_DIR, "board", "chess_board.png"))
-    board_img = pygame.transform.smoothscale(board_img, (WIDTH, HEIGHT))
-    pieces = load_piece_images()
-
     board = chess.Board()
     my_color = chess.WHITE if role == "host" else chess.BLACK
     selected_square = None
 
+    # Host optionally publishes the game to spectators
+    bcast_ws = bcast_closer = None
+    if BROADCAST and role == "host":
+        try:
+            bcast_ws, bcast_closer = asyncio.run_coroutine_threadsafe(
+                _ws_open(f"ws://{SIGNAL_HOST}:{SIGNAL_PORT}/publish?game={room}"), loop
+            ).result(timeout=5)
+            asyncio.run_coroutine_threadsafe(bcast_ws.send_str(snapshot_frame(board)), loop)
+            print("[broadcast] publishing room", room)
+        except Exception as e:
+            print("[broadcast] could not start:", e)
+
+    game_log = start_log("multiplayer", board)
+
+    def record_last_move():
+        if game_log:
+            game_log.append(board)
+        if bcast_ws is None:
+            return
+        for frame in broadcast_frames(board):
+            asyncio.run_coroutine_threadsafe(bcast_ws.send_str(frame), loop)
+
+    def send_local_move(mv):
+        record_last_move()
+        # sfx
+        if cap_snd and board.is_capture(mv): cap_snd.play()
+        elif move_snd: move_snd.play()
+        try:
+            uci = mv.uci()
+            print("[game] scheduling send:", uci)
+            # SCHEDULE SEND ON ASYNCIO LOOP (thread-safe)
+            loop.call_soon_threadsafe(chan.send, uci)
+        except Exception as ex:
+            print("[game] send schedule failed:", ex)
+
+    # Moves queued during the opponent's turn (right-click clears them)
+    premoves = []
+
+    # F3 frame-time overlay, F4 dump trace
+    prof = FrameProfiler("multiplayer")
+
     running = True
     while running:
+        prof.begin()
         for e in pygame.event.get():
+            if prof.handle_event(e) or view.handle_event(e):
+                continue
             if e.type == pygame.QUIT or (e.type == pygame.KEYDOWN and e.key == pygame.K_ESCAPE):
                 running = False
 
             allow_click = True if SANDBOX else (board.turn == my_color)
+            premoving = not allow_click
 
-            if e.type == pygame.MOUSEBUTTONDOWN and allow_click:
-                x, y = e.pos
-                if (OFFSET_X <= x < OFFSET_X + 8*TILE_W) and (OFFSET_Y <= y < OFFSET_Y + 8*TILE_H):
-                    col = (x - OFFSET_X) // TILE_W
-                    row = 7 - ((y - OFFSET_Y) // TILE_H)
-                    sq  = row * 8 + col
+            if e.type == pygame.MOUSEBUTTONDOWN and e.button == 3:
+                premoves.clear()
+                selected_square = None
+            elif e.type == pygame.MOUSEBUTTONDOWN:
+                sq = view.square_at(e.pos)
+                if sq is not None:
+                    # While premoving, pieces are where the queued premoves put them
+                    pos = premove_board(board, premoves) if premoving else board
 
                     if selected_square is None:
-                        p = board.piece_at(sq)
+                        p = pos.piece_at(sq)
                         if p and p.color == my_color:
                             selected_square = sq
                     else:
-                        p = board.piece_at(selected_square)
-                        if p and p.piece_type == chess.PAWN and chess.square_rank(sq) in [0,7]:
-                            promo = promotion_menu(screen, p.color, pieces)
+                        p = pos.piece_at(selected_square)
+                        if premoving and not premove_shape_ok(pos, selected_square, sq):
+                            mv = None   # a misclick, not a move this piece can make
+                        elif p and p.piece_type == chess.PAWN and chess.square_rank(sq) in [0,7]:
+                            promo = promotion_menu(screen, p.color, view)
                             mv = chess.Move(selected_square, sq, promotion=promo)
                         else:
                             mv = chess.Move(selected_square, sq)
 
-                        if try_push_move(board, mv, my_color):
-                            # sfx
-                            if cap_snd and board.is_capture(mv): cap_snd.play()
-                            elif move_snd: move_snd.play()
-                            try:
-                                uci = mv.uci()
-                                print("[game] scheduling send:", uci)
-                                # SCHEDULE SEND ON ASYNCIO LOOP (thread-safe)
-                                loop.call_soon_threadsafe(chan.send, uci)
-                            except Exception as ex:
-                                print("[game] send schedule failed:", ex)
+                        if premoving:
+                            if mv is not None:
+                                premoves.append(mv)
+                        elif try_push_move(board, mv, my_color):
+                            send_local_move(mv)
                         selected_square = None
+        prof.mark("events")
 
         # Drain inbound queue and apply moves
         while True:
@@ -457,22 +748,44 @@ def run():
             except queue.Empty:
                 break
             if apply_inbound_uci(board, uci):
+                record_last_move()
                 try:
                     mv = chess.Move.from_uci(uci)
                     if cap_snd and board.is_capture(mv): cap_snd.play()
                     elif move_snd: move_snd.play()
                 except Exception:
                     pass
-
-        draw_board(screen, board_img)
-        highlight_moves(screen, board, selected_square)
-        draw_pieces(screen, board, pieces)
+                # Reply straight away with the first queued premove
+                pm = try_premove(board, premoves, my_color)
+                if pm:
+                    send_local_move(pm)
+        prof.mark("inbound_q")
+
+        view.update()
+        draw_board(screen, view)
+        prof.mark("draw_board")
+        draw_premoves(screen, premoves, view)
+        highlight_moves(screen, board, selected_square, view)
+        prof.mark("highlight_moves")
+        # Show where the queued premoves will put our pieces
+        draw_pieces(screen, premove_board(board, premoves) if premoves else board, view)
+        prof.mark("draw_pieces")
+        prof.draw(screen)
+        prof.mark("overlay")
         pygame.display.flip()
+        prof.mark("flip")
         clock.tick(FPS)
+        prof.mark("idle")
+        prof.end()
 
     # Cleanup
+    if game_log:
+        game_log.close()
     try: asyncio.run_coroutine_threadsafe(closer(), loop).result(timeout=5)
     except: pass
+    if bcast_closer:
+        try: asyncio.run_coroutine_threadsafe(bcast_closer(), loop).result(timeout=3)
+        except: pass
     try: loop.call_soon_threadsafe(loop.stop)
     except: pass
     pygame.quit()
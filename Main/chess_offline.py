@@ -1,15 +1,21 @@
 import pygame
 import sys
+import math
+import threading
 import chess
+import chess.polyglot
 import os
+import time
 from typing import Optional
 
+from game_log import start_log
+from frame_profiler import FrameProfiler
+from analysis_cache import AnalysisCache
+from board_view import BoardView
+
 # --- Board settings ---
-WIDTH, HEIGHT = 800, 800
+WIDTH, HEIGHT = 800, 800   # initial window size; the window can be resized
 FPS = 60
-TILE_W, TILE_H = 84, 84
-OFFSET_X, OFFSET_Y = 55, 60
-PIECE_SCALE = 0.9
 
 # --- Paths ---
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
@@ -20,6 +26,12 @@ AUDIO_DIR = os.path.join(os.path.dirname(__file__), "audio")
 AI_PLAYS_WHITE = False
 AI_DEPTH = 2
 
+# --- Analysis mode ---
+ANALYSIS_LINES = 3        # principal variations shown
+ANALYSIS_MAX_DEPTH = 8    # deepening stops here
+ANALYSIS_PV_LEN = 6       # moves shown per line
+TT_MAX_ENTRIES = 500_000  # analysis table is cleared when it grows past this
+
 # --- Piece values ---
 PIECE_VAL = {
     chess.PAWN:   100,
@@ -45,12 +57,13 @@ def difficulty_menu(screen, font):
     while True:
         screen.fill((30, 30, 30))
         title = font.render("Select Difficulty", True, (255, 255, 255))
-        screen.blit(title, (WIDTH//2 - title.get_width()//2, 120))
+        cx = screen.get_width() // 2
+        screen.blit(title, (cx - title.get_width()//2, 120))
 
         start_y = 250
         buttons.clear()
         for i, (label, depth) in enumerate(options):
-            rect = pygame.Rect(WIDTH//2 - 100, start_y + i*90, 200, 60)
+            rect = pygame.Rect(cx - 100, start_y + i*90, 200, 60)
             pygame.draw.rect(screen, (80, 80, 80), rect)
             pygame.draw.rect(screen, (200, 200, 200), rect, 3)
             text = font.render(label, True, (255, 255, 255))
@@ -72,6 +85,7 @@ def difficulty_menu(screen, font):
 # Loaders & drawing
 # ---------------------------
 def load_piece_images():
+    """Unscaled piece images; BoardView keeps the scaled copies."""
     pieces = {}
     mapping = {"P": "Pawn", "R": "Rook", "N": "Knight",
                "B": "Bishop", "Q": "Queen", "K": "King"}
@@ -80,66 +94,54 @@ def load_piece_images():
             key = color + sym
             filename = f"{color}_{name}.png"
             path = os.path.join(PIECES_DIR, filename)
-            img = pygame.image.load(path).convert_alpha()
-            img = pygame.transform.smoothscale(
-                img, (int(TILE_W*PIECE_SCALE), int(TILE_H*PIECE_SCALE))
-            )
-            pieces[key] = img
+            pieces[key] = pygame.image.load(path).convert_alpha()
     return pieces
 
-def draw_board(screen, board_img):
-    screen.blit(board_img, (0, 0))
+def load_board_view(size=(WIDTH, HEIGHT)):
+    board_img = pygame.image.load(os.path.join(ASSETS_DIR, "board", "chess_board.png")).convert()
+    return BoardView(board_img, load_piece_images(), size)
+
+def draw_board(screen, view):
+    if screen.get_size() != (view.side, view.side):
+        screen.fill((30, 30, 30))
+    screen.blit(view.board_layer, view.origin)
 
-def draw_pieces(screen, board, piece_images):
-    TWEAK_X, TWEAK_Y = 0, 5
+def draw_pieces(screen, board, view):
     for square, piece in board.piece_map().items():
-        row = 7 - (square // 8)
-        col = square % 8
         key = ("w" if piece.color == chess.WHITE else "b") + piece.symbol().upper()
-        img = piece_images[key]
-        rect = pygame.Rect(
-            OFFSET_X + col*TILE_W,
-            OFFSET_Y + row*TILE_H,
-            TILE_W, TILE_H
-        )
-        x = rect.x + (TILE_W - img.get_width())//2 + TWEAK_X
-        y = rect.y + (TILE_H - img.get_height())//2 + TWEAK_Y
-        screen.blit(img, (x, y))
-
-def highlight_moves(screen, board, selected_square):
+        img = view.pieces[key]
+        screen.blit(img, view.piece_pos(square, img))
+
+def highlight_moves(screen, board, selected_square, view):
     if selected_square is None:
         return
     moves = [m for m in board.legal_moves if m.from_square == selected_square]
     for move in moves:
-        row = 7 - (move.to_square // 8)
-        col = move.to_square % 8
-        center = (
-            OFFSET_X + col * TILE_W + TILE_W // 2,
-            OFFSET_Y + row * TILE_H + TILE_H // 2,
-        )
-        pygame.draw.circle(screen, (0, 255, 0), center, 10)
+        pygame.draw.circle(screen, (0, 255, 0), view.square_center(move.to_square), view.px(10))
 
 # ---------------------------
 # Promotion menu
 # ---------------------------
-def promotion_menu(screen, color, piece_images):
+def promotion_menu(screen, color, view):
     choices = [chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT]
     labels = ["Q", "R", "B", "N"]
+    w, h = screen.get_size()
+    tile = round(view.tile)
 
-    overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
+    overlay = pygame.Surface((w, h), pygame.SRCALPHA)
     overlay.fill((0, 0, 0, 180))
     screen.blit(overlay, (0, 0))
 
     menu_buttons = []
-    start_x = WIDTH // 2 - (len(choices) * TILE_W) // 2
-    y = HEIGHT // 2 - TILE_H // 2
+    start_x = w // 2 - (len(choices) * tile) // 2
+    y = h // 2 - tile // 2
 
     for i, choice in enumerate(choices):
-        rect = pygame.Rect(start_x + i * (TILE_W + 10), y, TILE_W, TILE_H)
+        rect = pygame.Rect(start_x + i * (tile + 10), y, tile, tile)
         piece_key = ("w" if color == chess.WHITE else "b") + labels[i]
-        img = piece_images[piece_key]
-        x = rect.x + (TILE_W - img.get_width()) // 2
-        y_img = rect.y + (TILE_H - img.get_height()) // 2
+        img = view.pieces[piece_key]
+        x = rect.x + (tile - img.get_width()) // 2
+        y_img = rect.y + (tile - img.get_height()) // 2
         screen.blit(img, (x, y_img))
         menu_buttons.append((rect, choice))
 
@@ -167,7 +169,10 @@ def evaluate(board: chess.Board) -> int:
         score += PIECE_VAL[piece.piece_type] * (1 if piece.color else -1)
     return score if board.turn == chess.WHITE else -score
 
+search_stats = {"nodes": 0}   # nodes visited by alphabeta, read by the profiler
+
 def alphabeta(board, depth, alpha, beta):
+    search_stats["nodes"] += 1
     if depth == 0 or board.is_game_over():
         return evaluate(board)
     best = -1_000_000
@@ -180,16 +185,177 @@ def alphabeta(board, depth, alpha, beta):
         if alpha >= beta: break
     return best
 
+# Results from earlier sessions (set to None to search without it)
+position_cache = AnalysisCache()
+
 def find_ai_move(board, depth):
+    cached_score, cached_move = position_cache.lookup(board, depth) if position_cache else (None, None)
+    if cached_score is not None:
+        return cached_move
+
+    # A shallower stored result is searched first; with the window narrowed
+    # to beat the best so far, the remaining moves cut off sooner
+    moves = list(board.legal_moves)
+    if cached_move is not None:
+        moves.remove(cached_move)
+        moves.insert(0, cached_move)
     best_move = None
     best_val = -1_000_000
-    for move in board.legal_moves:
+    for move in moves:
         board.push(move)
-        val = -alphabeta(board, depth-1, -1_000_000, 1_000_000)
+        val = -alphabeta(board, depth-1, -1_000_000, -best_val)
         board.pop()
         if val > best_val:
             best_val, best_move = val, move
-    return best_move or next(iter(board.legal_moves))
+    best_move = best_move or moves[0]
+    if position_cache:
+        position_cache.store(board, depth, best_val, best_move)
+    return best_move
+
+# ---------------------------
+# Analysis search (transposition table, multi-PV)
+# ---------------------------
+MATE = 999999
+INF = 1_000_000
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+
+class SearchStopped(Exception):
+    pass
+
+def ordered_moves(board, first=None):
+    """TT move first, then captures, then the rest."""
+    moves = list(board.legal_moves)
+    moves.sort(key=lambda m: (m != first, not board.is_capture(m)))
+    return moves
+
+def tt_search(board, depth, alpha, beta, tt, stop, stats):
+    """Negamax alpha-beta that reads and fills `tt`:
+    zobrist hash -> (depth, score, flag, best move)."""
+    if stop.is_set():
+        raise SearchStopped
+    stats["nodes"] += 1
+    key = chess.polyglot.zobrist_hash(board)
+    entry = tt.get(key)
+    if entry and entry[0] >= depth:
+        _, score, flag, _ = entry
+        if flag == TT_EXACT or (flag == TT_LOWER and score >= beta) or (flag == TT_UPPER and score <= alpha):
+            return score
+    if depth == 0 or board.is_game_over():
+        return evaluate(board)
+
+    alpha0, best, best_move = alpha, -INF, None
+    for move in ordered_moves(board, entry[3] if entry else None):
+        board.push(move)
+        val = -tt_search(board, depth-1, -beta, -alpha, tt, stop, stats)
+        board.pop()
+        if val > best: best, best_move = val, move
+        if best > alpha: alpha = best
+        if alpha >= beta: break
+    flag = TT_UPPER if best <= alpha0 else TT_LOWER if best >= beta else TT_EXACT
+    tt[key] = (depth, best, flag, best_move)
+    return best
+
+def principal_variation(board, first, tt, length):
+    """Follow TT best moves from `first` to build a line."""
+    line, b = [first], board.copy(stack=False)
+    b.push(first)
+    while len(line) < length:
+        entry = tt.get(chess.polyglot.zobrist_hash(b))
+        if not entry or entry[3] is None or entry[3] not in b.legal_moves:
+            break
+        line.append(entry[3])
+        b.push(entry[3])
+    return line
+
+def multipv(board, depth, n_lines, tt, stop, stats, root_order=None):
+    """Scores of the best `n_lines` root moves at `depth`, best first.
+    Once n moves are scored, the rest are searched with the current nth-best
+    score as alpha: a move that can't beat it fails low early, and only moves
+    that do get an exact score."""
+    scored = []
+    for move in (root_order or ordered_moves(board)):
+        floor = scored[n_lines-1][0] if len(scored) >= n_lines else -INF
+        board.push(move)
+        val = -tt_search(board, depth-1, -INF, -floor, tt, stop, stats)
+        board.pop()
+        if val > floor or len(scored) < n_lines:
+            scored.append((val, move))
+            scored.sort(key=lambda s: -s[0])
+    return scored[:n_lines]
+
+class Analyzer:
+    """Background iterative-deepening multi-PV search on the current position.
+    The transposition table survives set_position(), so after a move the
+    subtree already searched is reused instead of starting from scratch."""
+
+    def __init__(self, lines=ANALYSIS_LINES, max_depth=ANALYSIS_MAX_DEPTH):
+        self.lines = lines
+        self.max_depth = max_depth
+        self.tt = {}
+        self.result = None   # dict(fen, depth, nodes, lines=[(score_white, [moves])])
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def set_position(self, board):
+        self._stop.set()
+        self._stop = threading.Event()
+        with self.lock:
+            self.result = None
+        if not board.is_game_over():
+            threading.Thread(target=self._run, args=(board.copy(), self._stop), daemon=True).start()
+
+    def close(self):
+        self._stop.set()
+
+    def snapshot(self):
+        with self.lock:
+            return self.result
+
+    def _run(self, board, stop):
+        stats = {"nodes": 0}
+        t0 = time.perf_counter()
+        sign = 1 if board.turn == chess.WHITE else -1
+        order = None
+        if len(self.tt) > TT_MAX_ENTRIES:
+            self.tt.clear()
+        try:
+            for depth in range(1, self.max_depth + 1):
+                scored = multipv(board, depth, self.lines, self.tt, stop, stats, order)
+                # Next iteration tries the best moves first
+                top = [m for _, m in scored]
+                order = top + [m for m in ordered_moves(board) if m not in top]
+                lines = [(sign * s, principal_variation(board, m, self.tt, ANALYSIS_PV_LEN))
+                         for s, m in scored]
+                with self.lock:
+                    if not stop.is_set():
+                        self.result = {"fen": board.fen(), "depth": depth,
+                                       "nodes": stats["nodes"], "lines": lines,
+                                       "elapsed": time.perf_counter() - t0}
+        except SearchStopped:
+            pass
+
+def draw_analysis(screen, board, result, font, view):
+    """Evaluation bar on the left edge, best-move arrow and PV text on top."""
+    bar = pygame.Rect(view.origin[0] + view.px(12), round(view.offset_y), view.px(24), round(8*view.tile))
+    pygame.draw.rect(screen, (20, 20, 20), bar)
+    if result is None or result["fen"] != board.fen():
+        return
+    score = result["lines"][0][0]
+    white_frac = 0.5 + 0.5 * math.tanh(score / 600)
+    white_h = int(bar.h * white_frac)
+    pygame.draw.rect(screen, (235, 235, 235), (bar.x, bar.bottom - white_h, bar.w, white_h))
+
+    best = result["lines"][0][1][0]
+    center = view.square_center
+    pygame.draw.line(screen, (40, 140, 255), center(best.from_square), center(best.to_square), view.px(6))
+    pygame.draw.circle(screen, (40, 140, 255), center(best.to_square), view.px(9))
+
+    for i, (s, line) in enumerate(result["lines"]):
+        s_txt = f"#{'+' if s > 0 else '-'}" if abs(s) >= MATE // 2 else f"{s/100:+.2f}"
+        text = f"{s_txt:>6}  {board.variation_san(line)}"
+        if i == 0:
+            text += f"   (depth {result['depth']}, {result['nodes']} nodes)"
+        screen.blit(font.render(text, True, (255, 255, 255)), (round(view.offset_x), view.origin[1] + 4 + i*18))
 
 # ---------------------------
 # Audio helpers
@@ -215,7 +381,7 @@ def run():
     global AI_DEPTH, AI_PLAYS_WHITE
 
     pygame.init()
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
     pygame.display.set_caption("Offline Chess (vs AI)")
     clock = pygame.time.Clock()
 
@@ -232,25 +398,38 @@ def run():
     # Difficulty menu
     AI_DEPTH = difficulty_menu(screen, font_menu)
 
-    # Board and pieces
-    board_img_path = os.path.join(ASSETS_DIR, "board", "chess_board.png")
-    board_img = pygame.image.load(board_img_path)
-    board_img = pygame.transform.smoothscale(board_img, (WIDTH, HEIGHT))
-    piece_images = load_piece_images()
+    # Board and pieces, scaled to the window (rebuilt on resize)
+    view = load_board_view(screen.get_size())
 
     board = chess.Board()
     selected_square: Optional[int] = None
+    game_log = start_log("offline", board)
+
+    # Analysis mode (E): human moves both sides, engine analyses in background
+    analysis_mode = False
+    analyzer = Analyzer()
+    analysis_font = pygame.font.SysFont("consolas", 16)
+    analysed_fen = None
+
+    # F3 frame-time overlay, F4 dump trace
+    prof = FrameProfiler("offline")
 
     running = True
     while running:
+        prof.begin()
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+            if prof.handle_event(event) or view.handle_event(event):
+                continue
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                if game_log: game_log.close()
+                analyzer.close()
+                if position_cache: position_cache.close()
                 return
             if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    return
                 if event.key == pygame.K_r:
                     board = chess.Board()
+                    if game_log: game_log.close()
+                    game_log = start_log("offline", board)
                 if event.key == pygame.K_a:
                     AI_PLAYS_WHITE = not AI_PLAYS_WHITE
                 if event.key == pygame.K_1:
@@ -259,15 +438,17 @@ def run():
                     AI_DEPTH = 2
                 if event.key == pygame.K_3:
                     AI_DEPTH = 3
+                if event.key == pygame.K_e:
+                    analysis_mode = not analysis_mode
+                    analysed_fen = None
+                    if not analysis_mode:
+                        analyzer.close()
 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 human_is_white = not AI_PLAYS_WHITE
-                if board.turn == (chess.WHITE if human_is_white else chess.BLACK):
-                    x, y = event.pos
-                    if (OFFSET_X <= x < OFFSET_X+8*TILE_W) and (OFFSET_Y <= y < OFFSET_Y+8*TILE_H):
-                        col = (x - OFFSET_X)//TILE_W
-                        row = 7 - ((y - OFFSET_Y)//TILE_H)
-                        square = row*8 + col
+                if analysis_mode or board.turn == (chess.WHITE if human_is_white else chess.BLACK):
+                    square = view.square_at(event.pos)
+                    if square is not None:
                         if selected_square is None:
                             if board.piece_at(square) and board.piece_at(square).color == board.turn:
                                 selected_square = square
@@ -275,7 +456,7 @@ def run():
                             # Handle promotion
                             if (board.piece_at(selected_square).piece_type == chess.PAWN
                                 and chess.square_rank(square) in [0, 7]):
-                                promotion_piece = promotion_menu(screen, board.turn, piece_images)
+                                promotion_piece = promotion_menu(screen, board.turn, view)
                                 move = chess.Move(selected_square, square, promotion=promotion_piece)
                             else:
                                 move = chess.Move(selected_square, square)
@@ -283,15 +464,19 @@ def run():
                             if move in board.legal_moves:
                                 before = board.copy()
                                 board.push(move)
+                                if game_log: game_log.append(board)
                                 play_sound_for_move(before, move, move_sound, capture_sound)
                             selected_square = None
+        prof.mark("events")
 
         # AI move
-        if not board.is_game_over():
+        if not analysis_mode and not board.is_game_over():
             ai_turn = (board.turn == chess.WHITE and AI_PLAYS_WHITE) or \
                       (board.turn == chess.BLACK and not AI_PLAYS_WHITE)
             if ai_turn:
+                nodes0, t0 = search_stats["nodes"], time.perf_counter()
                 ai_move = find_ai_move(board, AI_DEPTH)
+                prof.add_search(search_stats["nodes"] - nodes0, time.perf_counter() - t0)
                 # auto promote to queen if pawn hits last rank
                 if ai_move.promotion is None:
                     if board.piece_at(ai_move.from_square) and \
@@ -300,13 +485,34 @@ def run():
                         ai_move = chess.Move(ai_move.from_square, ai_move.to_square, promotion=chess.QUEEN)
                 before = board.copy()
                 board.push(ai_move)
+                if game_log: game_log.append(board)
                 play_sound_for_move(before, ai_move, move_sound, capture_sound)
-
-        draw_board(screen, board_img)
-        highlight_moves(screen, board, selected_square)
-        draw_pieces(screen, board, piece_images)
+        prof.mark("ai")
+
+        if analysis_mode and board.fen() != analysed_fen:
+            analysed_fen = board.fen()
+            analyzer.set_position(board)
+
+        view.update()
+        draw_board(screen, view)
+        prof.mark("draw_board")
+        highlight_moves(screen, board, selected_square, view)
+        prof.mark("highlight_moves")
+        draw_pieces(screen, board, view)
+        prof.mark("draw_pieces")
+        if analysis_mode:
+            result = analyzer.snapshot()
+            draw_analysis(screen, board, result, analysis_font, view)
+            if result:
+                prof.add_search(result["nodes"], result["elapsed"])
+            prof.mark("analysis")
+        prof.draw(screen)
+        prof.mark("overlay")
         pygame.display.flip()
+        prof.mark("flip")
         clock.tick(FPS)
+        prof.mark("idle")
+        prof.end()
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,142 @@
+# frame_profiler.py
+"""Per-frame phase timing for the pygame loops.
+
+    prof = FrameProfiler("offline")
+    while running:
+        prof.begin()
+        ...handle events...      ; prof.mark("events")
+        draw_board(...)          ; prof.mark("draw_board")
+        prof.draw(screen)        # overlay, only when toggled on
+        pygame.display.flip()    ; prof.mark("flip")
+        clock.tick(FPS)          ; prof.mark("idle")
+        prof.end()
+
+F3 toggles the overlay (rolling p50/p95/p99 frame and work times, per-phase
+p95, engine nodes/s). F4 writes the recorded trace to profiles/ in
+user_data.DATA_DIR as CSV; set PROFILE_FORMAT=json for JSON. A mark is one
+perf_counter() call and a dict store, so the profiler is always on.
+"""
+import os, csv, json, time
+from collections import deque
+
+import pygame
+
+from user_data import DATA_DIR
+
+PROFILES_DIR = os.path.join(DATA_DIR, "profiles")
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "csv").lower()
+ROLLING_FRAMES = 600       # overlay statistics window (~10 s at 60 FPS)
+TRACE_FRAMES = 36000       # frames kept for export (~10 min at 60 FPS)
+IDLE_PHASE = "idle"        # time spent waiting in clock.tick()
+OVERLAY_REFRESH = 15       # recompute percentiles every N frames
+
+def percentile(sorted_vals, p):
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(p / 100 * len(sorted_vals)))]
+
+class FrameProfiler:
+    def __init__(self, name):
+        self.name = name
+        self.visible = os.getenv("PROFILE", "0") == "1"
+        self.frame = 0
+        self.phases = {}
+        self.rolling = deque(maxlen=ROLLING_FRAMES)   # (frame_ms, {phase: ms})
+        self.trace = deque(maxlen=TRACE_FRAMES)       # (frame, t, frame_ms, {phase: ms}, nps)
+        self.nps = 0.0
+        self.phase_names = []
+        self._t0 = self._last = time.perf_counter()
+        self._lines = []
+        self._font = None
+
+    # --- timing ---
+    def begin(self):
+        self._t0 = self._last = time.perf_counter()
+        self.phases = {}
+
+    def mark(self, phase):
+        """Charge the time since the previous mark to `phase`."""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def end(self):
+        frame_ms = (self._last - self._t0) * 1000
+        self.rolling.append((frame_ms, self.phases))
+        self.trace.append((self.frame, self._t0, frame_ms, self.phases, self.nps))
+        for p in self.phases:
+            if p not in self.phase_names:
+                self.phase_names.append(p)
+        self.frame += 1
+
+    def add_search(self, nodes, seconds):
+        """Report an engine search so the overlay can show nodes per second."""
+        if seconds > 0:
+            self.nps = nodes / seconds
+
+    # --- keys ---
+    def handle_event(self, event):
+        if event.type != pygame.KEYDOWN:
+            return False
+        if event.key == pygame.K_F3:
+            self.visible = not self.visible
+            return True
+        if event.key == pygame.K_F4:
+            print(f"[profiler] trace written to {self.dump()}")
+            return True
+        return False
+
+    # --- overlay ---
+    def _summarize(self):
+        frames = sorted(f for f, _ in self.rolling)
+        work = sorted(f - ph.get(IDLE_PHASE, 0.0) for f, ph in self.rolling)
+        lines = [
+            f"{self.name}  {len(frames)} frames",
+            "frame ms  p50 {:.2f}  p95 {:.2f}  p99 {:.2f}".format(
+                percentile(frames, 50), percentile(frames, 95), percentile(frames, 99)),
+            "work  ms  p50 {:.2f}  p95 {:.2f}  p99 {:.2f}".format(
+                percentile(work, 50), percentile(work, 95), percentile(work, 99)),
+        ]
+        for p in self.phase_names:
+            if p == IDLE_PHASE:
+                continue
+            vals = sorted(ph.get(p, 0.0) for _, ph in self.rolling)
+            lines.append(f"  {p:<16} p95 {percentile(vals, 95):7.2f}  max {vals[-1] if vals else 0:7.2f}")
+        if self.nps:
+            lines.append(f"engine {self.nps:,.0f} nodes/s")
+        return lines
+
+    def draw(self, screen):
+        if not self.visible:
+            return
+        if self._font is None:
+            self._font = pygame.font.SysFont("consolas", 14)
+        if self.frame % OVERLAY_REFRESH == 0 or not self._lines:
+            self._lines = self._summarize()
+        w = 330
+        h = 6 + 16 * len(self._lines)
+        panel = pygame.Surface((w, h), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for i, line in enumerate(self._lines):
+            panel.blit(self._font.render(line, True, (120, 255, 120)), (6, 3 + 16 * i))
+        screen.blit(panel, (screen.get_width() - w - 6, 6))
+
+    # --- export ---
+    def dump(self, path=None):
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        ext = "json" if PROFILE_FORMAT == "json" else "csv"
+        path = path or os.path.join(PROFILES_DIR, time.strftime(f"{self.name}-%Y%m%d-%H%M%S.{ext}"))
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({"name": self.name, "phases": self.phase_names, "frames": [
+                    {"frame": n, "t": t, "frame_ms": ms, "phases": ph, "nps": nps}
+                    for n, t, ms, ph, nps in self.trace
+                ]}, f)
+        else:
+            with open(path, "w", newline="") as f:
+                w = csv.writer(f)
+                w.writerow(["frame", "t", "frame_ms"] + self.phase_names + ["nps"])
+                for n, t, ms, ph, nps in self.trace:
+                    w.writerow([n, f"{t:.6f}", f"{ms:.3f}"] +
+                               [f"{ph.get(p, 0.0):.3f}" for p in self.phase_names] + [f"{nps:.0f}"])
+        return path
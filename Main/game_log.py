@@ -0,0 +1,239 @@
+# game_log.py
+"""Append-only binary game log, memory-mapped replay and PGN export.
+
+File layout (little endian):
+
+    header   16 bytes   magic "P2PLOG1\\0", version u8, checkpoint interval K u8,
+                        reserved u16, created (unix time) u32
+    block 0  checkpoint (FEN padded to 96 bytes) + up to K packed moves
+    block 1  checkpoint + up to K moves
+    ...
+
+Every block has the same size, so the checkpoint for any ply is at a
+computed offset: seeking replays at most K-1 moves, no matter how long
+the game is. A move packs into a u16: from (6 bits) | to (6) | promotion (3).
+Logs go to games/ in user_data.DATA_DIR.
+
+    python game_log.py games/<file>.p2plog            # replay viewer
+    python game_log.py games/<file>.p2plog --pgn out.pgn
+"""
+import os, sys, time, mmap, struct
+import chess
+import chess.pgn
+
+from user_data import DATA_DIR
+
+GAMES_DIR = os.path.join(DATA_DIR, "games")
+LOG_EXT = ".p2plog"
+
+MAGIC = b"P2PLOG1\0"
+VERSION = 1
+HEADER = struct.Struct("<8sBBHI")
+CHECKPOINT_SIZE = 96
+MOVE = struct.Struct("<H")
+CHECKPOINT_EVERY = 16
+
+def pack_move(mv: chess.Move) -> int:
+    return mv.from_square | (mv.to_square << 6) | ((mv.promotion or 0) << 12)
+
+def unpack_move(v: int) -> chess.Move:
+    return chess.Move(v & 63, (v >> 6) & 63, promotion=(v >> 12) or None)
+
+def _pack_checkpoint(board: chess.Board) -> bytes:
+    return board.fen().encode("ascii").ljust(CHECKPOINT_SIZE, b"\0")
+
+def new_log_path(mode):
+    os.makedirs(GAMES_DIR, exist_ok=True)
+    stem = os.path.join(GAMES_DIR, time.strftime(f"%Y%m%d-%H%M%S-{mode}"))
+    path, n = stem + LOG_EXT, 1
+    while os.path.exists(path):
+        n += 1
+        path = f"{stem}-{n}{LOG_EXT}"
+    return path
+
+def latest_log():
+    try:
+        logs = [f for f in os.listdir(GAMES_DIR) if f.endswith(LOG_EXT)]
+    except OSError:
+        return None
+    return os.path.join(GAMES_DIR, max(logs)) if logs else None
+
+# ---------------------------
+# Writing
+# ---------------------------
+class GameLogWriter:
+    """Appends each move as it is played; a checkpoint starts every block.
+    The file is only created with the first move, so games abandoned before
+    a move is played leave nothing behind for the replay to pick up."""
+
+    def __init__(self, mode, board=None, every=CHECKPOINT_EVERY):
+        self.mode = mode
+        self.every = every
+        self.plies = 0
+        self.start = (board or chess.Board()).copy(stack=False)
+        self.path = None
+        self.f = None
+
+    def _open(self):
+        self.path = new_log_path(self.mode)
+        self.f = open(self.path, "xb")
+        self.f.write(HEADER.pack(MAGIC, VERSION, self.every, 0, int(time.time())))
+        self.f.write(_pack_checkpoint(self.start))
+
+    def append(self, board: chess.Board):
+        """Record the move just pushed on `board`."""
+        if self.mode is None:
+            return
+        if self.f is None:
+            try:
+                self._open()
+            except OSError as e:
+                print("[game_log] could not create log:", e)
+                self.mode = None
+                return
+        self.f.write(MOVE.pack(pack_move(board.peek())))
+        self.plies += 1
+        if self.plies % self.every == 0:
+            self.f.write(_pack_checkpoint(board))
+        self.f.flush()
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        self.mode = None
+
+def start_log(mode, board=None):
+    """Writer for a new game; its file appears with the first move."""
+    return GameLogWriter(mode, board)
+
+# ---------------------------
+# Reading
+# ---------------------------
+class GameLog:
+    """Read-only, memory-mapped view of a log file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "rb")
+        self.mm = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.every, _, self.created = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a P2P chess game log")
+        self.block = CHECKPOINT_SIZE + self.every * MOVE.size
+        body = len(self.mm) - HEADER.size
+        full, rem = divmod(body, self.block)
+        # A trailing partial move (crash mid-write) is ignored
+        self.plies = full * self.every + max(0, rem - CHECKPOINT_SIZE) // MOVE.size
+
+    def __len__(self):
+        return self.plies
+
+    def _checkpoint(self, block):
+        off = HEADER.size + block * self.block
+        return chess.Board(self.mm[off:off + CHECKPOINT_SIZE].rstrip(b"\0").decode("ascii"))
+
+    def move(self, ply):
+        """The move that leads from ply to ply + 1."""
+        block, i = divmod(ply, self.every)
+        off = HEADER.size + block * self.block + CHECKPOINT_SIZE + i * MOVE.size
+        return unpack_move(MOVE.unpack_from(self.mm, off)[0])
+
+    def board_at(self, ply):
+        """Position after `ply` half-moves, from the nearest checkpoint."""
+        ply = max(0, min(ply, self.plies))
+        block = ply // self.every
+        board = self._checkpoint(block)
+        for p in range(block * self.every, ply):
+            board.push(self.move(p))
+        return board
+
+    def moves(self):
+        return [self.move(p) for p in range(self.plies)]
+
+    def to_pgn(self):
+        board = self._checkpoint(0)
+        for mv in self.moves():
+            board.push(mv)
+        game = chess.pgn.Game.from_board(board)
+        game.headers["Event"] = "P2P Chess"
+        game.headers["Site"] = os.path.basename(self.path)
+        game.headers["Date"] = time.strftime("%Y.%m.%d", time.localtime(self.created))
+        game.headers["Result"] = board.result(claim_draw=True) if board.is_game_over(claim_draw=True) else "*"
+        return str(game)
+
+    def export_pgn(self, out_path=None):
+        out_path = out_path or os.path.splitext(self.path)[0] + ".pgn"
+        with open(out_path, "w") as f:
+            f.write(self.to_pgn() + "\n")
+        return out_path
+
+    def close(self):
+        self.mm.close()
+        self.f.close()
+
+# ---------------------------
+# Replay viewer
+# ---------------------------
+def run_replay(path):
+    import pygame
+    from chess_offline import WIDTH, HEIGHT, FPS, load_board_view, draw_board, draw_pieces
+
+    log = GameLog(path)
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption(f"Replay - {os.path.basename(path)}")
+    clock = pygame.time.Clock()
+    font = pygame.font.SysFont("consolas", 18)
+
+    view = load_board_view(screen.get_size())
+    ply, shown, board = len(log), None, None
+    status = "<-/-> step  PgUp/PgDn 10  Home/End  click bar to seek  E export PGN  ESC back"
+
+    while True:
+        w, h = screen.get_size()
+        bar = pygame.Rect(20, h - 22, w - 40, 12)
+        for event in pygame.event.get():
+            view.handle_event(event)
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                log.close()
+                return
+            if event.type == pygame.KEYDOWN:
+                step = {pygame.K_LEFT: -1, pygame.K_RIGHT: 1,
+                        pygame.K_PAGEUP: -10, pygame.K_PAGEDOWN: 10}.get(event.key)
+                if step:
+                    ply += step
+                if event.key == pygame.K_HOME:
+                    ply = 0
+                if event.key == pygame.K_END:
+                    ply = len(log)
+                if event.key == pygame.K_e:
+                    status = f"PGN written to {log.export_pgn()}"
+            if event.type == pygame.MOUSEBUTTONDOWN and bar.collidepoint(event.pos):
+                ply = round((event.pos[0] - bar.x) / bar.w * len(log))
+        ply = max(0, min(ply, len(log)))
+
+        if ply != shown:
+            board, shown = log.board_at(ply), ply
+
+        view.update()
+        draw_board(screen, view)
+        draw_pieces(screen, board, view)
+        pygame.draw.rect(screen, (40, 40, 40), bar)
+        if len(log):
+            pygame.draw.rect(screen, (200, 170, 60), (bar.x, bar.y, bar.w * ply // len(log), bar.h))
+        screen.blit(font.render(f"ply {ply}/{len(log)}   {status}", True, (255, 255, 255)), (20, 8))
+        pygame.display.flip()
+        clock.tick(FPS)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    path = args[0] if args and not args[0].startswith("--") else latest_log()
+    if not path:
+        sys.exit("usage: python game_log.py <game.p2plog> [--pgn out.pgn]")
+    if "--pgn" in args:
+        i = args.index("--pgn")
+        out = args[i + 1] if i + 1 < len(args) else None
+        print(GameLog(path).export_pgn(out))
+    else:
+        run_replay(path)
@@ -5,6 +5,8 @@ import os
 
 from chess_offline import run as run_offline
 from chess_multiplayer import run as run_multiplayer
+from game_log import latest_log, run_replay
+from frame_profiler import FrameProfiler
 
 # --- MENU CONFIG ---
 WIDTH, HEIGHT = 800, 600
@@ -56,9 +58,15 @@ def run():
     frame = 0
     debug_mode = False   # press D to toggle outlines always-on
 
+    # F3 frame-time overlay, F4 dump trace
+    prof = FrameProfiler("menu")
+
     running = True
     while running:
+        prof.begin()
         for event in pygame.event.get():
+            if prof.handle_event(event):
+                continue
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -67,6 +75,15 @@ def run():
                 if event.key == pygame.K_d:
                     debug_mode = not debug_mode
                     print("Debug glow:", debug_mode)
+                if event.key == pygame.K_l:
+                    # replay the most recent recorded game
+                    path = latest_log()
+                    if path:
+                        run_replay(path)
+                        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+                        prof.begin()
+                    else:
+                        print("[menu] no recorded games yet")
 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 for name, rect, callback in buttons:
@@ -91,6 +108,9 @@ def run():
                             pygame.mixer.music.play(-1)
                         except Exception as e:
                             print(f"[warn] Could not resume menu music: {e}")
+                        # don't charge the game's time to this menu frame
+                        prof.begin()
+        prof.mark("events")
 
         # draw background
         if bg:
@@ -107,6 +127,12 @@ def run():
         for _, rect, _ in buttons:
             if rect.collidepoint(mouse_pos) or debug_mode:
                 pygame.draw.rect(screen, GLOW_COLOR, rect, glow_thickness, border_radius=GLOW_RADIUS)
+        prof.mark("draw")
 
+        prof.draw(screen)
+        prof.mark("overlay")
         pygame.display.flip()
+        prof.mark("flip")
         clock.tick(FPS)
+        prof.mark("idle")
+        prof.end()
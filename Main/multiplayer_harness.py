@@ -0,0 +1,204 @@
+# multiplayer_harness.py
+"""Headless multiplayer games over the real WebRTC path.
+
+Starts signal_server.app in-process on loopback, then plays full games
+between two scripted aiortc peers (no STUN servers) through the same
+_webrtc_prewarm / _webrtc_connect / try_push_move / apply_inbound_uci code
+the GUI uses. Packet delay and loss can be injected below DTLS, so SCTP's
+own retransmission is exercised. Reports connect time, per-move delivery
+latency and process CPU per game; --fail-p99-ms turns it into a check.
+
+    python multiplayer_harness.py --games 5
+    python multiplayer_harness.py --games 3 --delay-ms 40 --loss 0.05 --json out.json
+"""
+import os, io, sys, json, time, queue, random, asyncio, argparse, contextlib
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import chess
+from aiohttp import web
+from aiortc import RTCConfiguration
+from aiortc.exceptions import InvalidStateError
+
+import signal_server
+import chess_multiplayer as cm
+from signal_loadtest import percentile
+
+class TimedQueue(queue.Queue):
+    """inbound_q that notes when each message came off the data channel."""
+
+    def __init__(self):
+        super().__init__()
+        self.arrived = {}   # message -> perf_counter() at arrival
+
+    def put_nowait(self, item):
+        self.arrived[item] = time.perf_counter()
+        super().put_nowait(item)
+
+def impair(ice_transport, delay_s, loss, rng):
+    """Drop or delay every datagram this peer sends (DTLS records, so the
+    handshake and SCTP both see it)."""
+    if not delay_s and not loss:
+        return
+    send = ice_transport._send
+    loop = asyncio.get_running_loop()
+
+    async def late_send(data):
+        # The connection may have closed while the datagram was "in flight"
+        with contextlib.suppress(ConnectionError):
+            await send(data)
+
+    async def impaired_send(data):
+        if rng.random() < loss:
+            return
+        if delay_s:
+            loop.call_later(delay_s, lambda: asyncio.ensure_future(late_send(data)))
+        else:
+            await send(data)
+    ice_transport._send = impaired_send
+
+async def start_server():
+    runner = web.AppRunner(signal_server.app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"{host}:{port}"
+
+async def open_peer(addr, room, is_host, args, rng):
+    q = TimedQueue()
+    warm = await cm._webrtc_prewarm(f"http://{addr}", q)
+    impair(warm["ice_transport"], args.delay_ms / 1000, args.loss, rng)
+    fut = asyncio.get_running_loop().create_future()
+    fut.set_result(warm)
+    _, box, closer, _ = await cm._webrtc_connect(f"ws://{addr}/ws?room={room}", is_host, q, fut)
+    return {"q": q, "box": box, "closer": closer,
+            "board": chess.Board(), "color": chess.WHITE if is_host else chess.BLACK}
+
+async def wait_for(cond, timeout):
+    deadline = time.perf_counter() + timeout
+    while not cond():
+        if time.perf_counter() > deadline:
+            raise TimeoutError
+        await asyncio.sleep(0.001)
+
+async def play_game(addr, game_no, args):
+    rng = random.Random(args.seed + game_no)
+    room = f"H{game_no}x{rng.randrange(1 << 30)}"
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    host, joiner = await asyncio.gather(open_peer(addr, room, True, args, rng),
+                                        open_peer(addr, room, False, args, rng))
+    peers = {chess.WHITE: host, chess.BLACK: joiner}
+    result = {"game": game_no, "ok": False, "plies": 0, "latency_ms": []}
+    try:
+        # open_flag also flips on PC "connected"; moves need the channel itself
+        await wait_for(lambda: all(p["box"]["ch"].readyState == "open" for p in (host, joiner)),
+                       args.timeout)
+        result["connect_ms"] = (time.perf_counter() - t0) * 1000
+
+        # Scripted play: the side to move picks a random legal move on its own
+        # board, sends it, and the other side must accept it from its queue
+        while True:
+            mover = peers[host["board"].turn]
+            other = peers[not mover["board"].turn]
+            board = mover["board"]
+            if board.is_game_over() or board.ply() >= args.max_plies:
+                break
+            mv = rng.choice(list(board.legal_moves))
+            if not cm.try_push_move(board, mv, mover["color"]):
+                raise RuntimeError(f"own move rejected: {mv.uci()}")
+            sent = time.perf_counter()
+            mover["box"]["ch"].send(mv.uci())
+
+            uci = None
+            def arrived():
+                nonlocal uci
+                while True:
+                    try:
+                        uci = other["q"].get_nowait()
+                    except queue.Empty:
+                        return False
+                    if uci != "__hello__":
+                        return True
+            await wait_for(arrived, args.timeout)
+            result["latency_ms"].append((other["q"].arrived.pop(uci) - sent) * 1000)
+            if not cm.apply_inbound_uci(other["board"], uci):
+                raise RuntimeError(f"peer rejected {uci}")
+        result["plies"] = host["board"].ply()
+        result["ok"] = host["board"].fen() == joiner["board"].fen()
+    except (TimeoutError, RuntimeError, InvalidStateError) as e:
+        result["error"] = repr(e)
+    finally:
+        for p in (host, joiner):
+            with contextlib.suppress(Exception):
+                await p["closer"]()
+    result["cpu_ms"] = (time.process_time() - cpu0) * 1000
+    result["wall_ms"] = (time.perf_counter() - t0) * 1000
+    return result
+
+async def main(args):
+    cm.RTC_CONFIG = RTCConfiguration(iceServers=[])
+    cm.ICE_MODE = args.ice_mode
+    runner, addr = await start_server()
+    print(f"[harness] signal server on {addr}; {args.games} games, "
+          f"delay {args.delay_ms} ms, loss {args.loss:.0%}, ICE {args.ice_mode}")
+    results = []
+    try:
+        for g in range(args.games):
+            chatter = io.StringIO()
+            with contextlib.redirect_stdout(sys.stdout if args.verbose else chatter):
+                r = await play_game(addr, g, args)
+            results.append(r)
+            lat = r["latency_ms"]
+            print(f"[harness] game {g}: {'ok' if r['ok'] else 'FAILED ' + r.get('error', 'boards differ')}  "
+                  f"connect {r.get('connect_ms', 0):.0f} ms  {r['plies']} plies  "
+                  f"move p50 {percentile(lat, 50):.2f} ms  cpu {r['cpu_ms']:.0f} ms")
+    finally:
+        await runner.cleanup()
+
+    lat = [x for r in results for x in r["latency_ms"]]
+    connect = [r["connect_ms"] for r in results if "connect_ms" in r]
+    report = {
+        "games": len(results),
+        "failed": sum(not r["ok"] for r in results),
+        "connect_ms_p50": round(percentile(connect, 50), 1),
+        "connect_ms_max": round(max(connect, default=0), 1),
+        "moves": len(lat),
+        "move_ms_p50": round(percentile(lat, 50), 2),
+        "move_ms_p95": round(percentile(lat, 95), 2),
+        "move_ms_p99": round(percentile(lat, 99), 2),
+        "move_ms_max": round(max(lat, default=0), 2),
+        "cpu_ms_per_game": round(sum(r["cpu_ms"] for r in results) / max(1, len(results)), 1),
+        "delay_ms": args.delay_ms,
+        "loss": args.loss,
+    }
+    for k, v in report.items():
+        print(f"  {k:16s} {v}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"summary": report, "games": results}, f, indent=2)
+        print(f"[harness] wrote {args.json}")
+
+    if report["failed"]:
+        return 1
+    if args.fail_p99_ms and report["move_ms_p99"] > args.fail_p99_ms:
+        print(f"[harness] move p99 {report['move_ms_p99']} ms over limit {args.fail_p99_ms} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--games", type=int, default=3)
+    ap.add_argument("--max-plies", type=int, default=200)
+    ap.add_argument("--delay-ms", type=float, default=0.0, help="added one-way delay per datagram")
+    ap.add_argument("--loss", type=float, default=0.0, help="fraction of datagrams dropped")
+    ap.add_argument("--ice-mode", choices=("bundled", "trickle"), default=cm.ICE_MODE)
+    ap.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for a connection or move")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--fail-p99-ms", type=float, help="exit 1 if move p99 latency exceeds this")
+    ap.add_argument("--json", help="also write summary and per-game results here")
+    ap.add_argument("--verbose", action="store_true", help="show the connection log")
+    try:
+        sys.exit(asyncio.run(main(ap.parse_args())))
+    except KeyboardInterrupt:
+        sys.exit(1)
@@ -0,0 +1,217 @@
+# selfplay.py
+"""Headless self-play between two engine configurations.
+
+Plays --games games between config A and config B in worker processes.
+The engines are deterministic, so every pair of games gets its own start
+position (a book line plus --random-plies seeded random moves), played
+once with each colour. Games end on checkmate, stalemate or the automatic
+draw rules (a claimable threefold repetition does not end them); games
+that drag on are adjudicated. Each result is appended to a JSONL file as
+it finishes, and the summary gives A's Elo difference with a 95% interval plus the
+average time per move of each side: strength per millisecond when picking
+the depths behind difficulty_menu.
+
+    python selfplay.py --a d2 --b d3 --games 40 --workers 4
+    python selfplay.py --a d1 --b d2 --out results/d1-vs-d2.jsonl
+
+A config is "d<depth>", the same search find_ai_move runs for a menu entry.
+"""
+import os, sys, json, math, time, random, argparse
+from multiprocessing import Pool
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import chess
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "selfplay")
+
+# Short, common opening lines (SAN) so games don't all start the same way
+OPENINGS = [
+    "",
+    "e4 e5 Nf3 Nc6",
+    "e4 c5 Nf3 d6",
+    "e4 e6 d4 d5",
+    "e4 c6 d4 d5",
+    "d4 d5 c4 e6",
+    "d4 Nf6 c4 g6",
+    "d4 d5 c4 c6",
+    "c4 e5 Nc3 Nf6",
+    "Nf3 d5 g3 Nf6",
+    "e4 e5 Nf3 Nc6 Bb5 a6",
+    "e4 e5 Nf3 Nc6 Bc4 Bc5",
+    "d4 Nf6 c4 e6 Nc3 Bb4",
+    "e4 d5 exd5 Qxd5",
+    "e4 Nf6 e5 Nd5",
+    "d4 f5 g3 Nf6",
+]
+
+def parse_config(spec):
+    if not (spec.startswith("d") and spec[1:].isdigit() and int(spec[1:]) >= 1):
+        raise argparse.ArgumentTypeError(f"bad engine config {spec!r} (expected d<depth>, e.g. d2)")
+    return {"name": spec, "depth": int(spec[1:])}
+
+def opening_board(san_line):
+    board = chess.Board()
+    for san in san_line.split():
+        board.push_san(san)
+    return board
+
+def start_positions(pairs, random_plies, seed):
+    """`pairs` start lines (UCI moves) with distinct positions: a book line
+    plus seeded random plies. Exits if that can't produce enough of them."""
+    rng = random.Random(seed)
+    seen, starts = set(), []
+    for _ in range(pairs * 50):
+        if len(starts) == pairs:
+            break
+        board = opening_board(OPENINGS[len(starts) % len(OPENINGS)])
+        for _ in range(random_plies):
+            if board.is_game_over():
+                break
+            board.push(rng.choice(list(board.legal_moves)))
+        key = board.epd()
+        if board.is_game_over() or key in seen:
+            continue
+        seen.add(key)
+        starts.append(" ".join(m.uci() for m in board.move_stack))
+    if len(starts) < pairs:
+        raise SystemExit(f"only {len(starts)} distinct start positions for {pairs} game pairs; "
+                         f"raise --random-plies")
+    return starts
+
+def material(board):
+    from chess_offline import PIECE_VAL
+    return sum(PIECE_VAL[p.piece_type] * (1 if p.color else -1)
+               for p in board.piece_map().values() if p.piece_type != chess.KING)
+
+def _init_worker(use_cache):
+    import chess_offline
+    if not use_cache:
+        chess_offline.position_cache = None
+
+def play_game(job):
+    """Play one game; returns a result dict scored from A's point of view."""
+    from chess_offline import find_ai_move
+    game_no, opening, a_white, a, b, max_plies, adj_margin, adj_plies = job
+    board = chess.Board()
+    for uci in opening.split():
+        board.push_uci(uci)
+    white, black = (a, b) if a_white else (b, a)
+    think = {a["name"]: [0.0, 0], b["name"]: [0.0, 0]}
+    result, reason, ahead = None, None, 0
+
+    while result is None:
+        # Only automatic endings (fivefold repetition, 75-move rule): a
+        # claimable threefold repetition doesn't end the game
+        outcome = board.outcome()
+        if outcome:
+            result, reason = outcome.result(), outcome.termination.name.lower()
+            break
+        if board.ply() >= max_plies:
+            result, reason = "1/2-1/2", "max plies"
+            break
+        cfg = white if board.turn == chess.WHITE else black
+        t0 = time.perf_counter()
+        mv = find_ai_move(board, cfg["depth"])
+        think[cfg["name"]][0] += time.perf_counter() - t0
+        think[cfg["name"]][1] += 1
+        board.push(mv)
+        # Adjudicate a win once one side stays clearly ahead in material
+        diff = material(board)
+        side = (diff > 0) - (diff < 0) if abs(diff) >= adj_margin else 0
+        ahead = ahead + side if ahead * side > 0 else side
+        if abs(ahead) >= adj_plies:
+            result, reason = ("1-0" if ahead > 0 else "0-1"), "material"
+
+    white_score = {"1-0": 1.0, "0-1": 0.0}.get(result, 0.5)
+    return {
+        "game": game_no,
+        "opening": opening,
+        "white": white["name"],
+        "black": black["name"],
+        "result": result,
+        "reason": reason,
+        "plies": board.ply(),
+        "score_a": white_score if a_white else 1.0 - white_score,
+        "ms_per_move": {k: (t / n * 1000 if n else 0.0) for k, (t, n) in think.items()},
+        "moves": {k: n for k, (t, n) in think.items()},
+    }
+
+def elo(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+def summarize(results, a, b):
+    n = len(results)
+    scores = [r["score_a"] for r in results]
+    mean = sum(scores) / n
+    var = sum((s - mean) ** 2 for s in scores) / max(1, n - 1)
+    se = math.sqrt(var / n)
+    ms = {}
+    for cfg in (a["name"], b["name"]):
+        total = sum(r["ms_per_move"][cfg] * r["moves"][cfg] for r in results)
+        moves = sum(r["moves"][cfg] for r in results)
+        ms[cfg] = total / moves if moves else 0.0
+    return {
+        "a": a["name"], "b": b["name"], "games": n,
+        "wins_a": sum(s == 1.0 for s in scores),
+        "draws": sum(s == 0.5 for s in scores),
+        "losses_a": sum(s == 0.0 for s in scores),
+        "score_a": round(mean, 4),
+        "elo_a": round(elo(mean), 1),
+        "elo_a_low": round(elo(mean - 1.96 * se), 1),
+        "elo_a_high": round(elo(mean + 1.96 * se), 1),
+        "ms_per_move": {k: round(v, 2) for k, v in ms.items()},
+        "adjudicated": sum(r["reason"] in ("max plies", "material") for r in results),
+        "repetition_draws": sum(r["reason"] == "fivefold_repetition" for r in results),
+    }
+
+def main(args):
+    a, b = args.a, args.b
+    starts = start_positions((args.games + 1) // 2, args.random_plies, args.seed)
+    jobs = []
+    for g in range(args.games):
+        opening = starts[g // 2]
+        jobs.append((g, opening, g % 2 == 0, a, b, args.max_plies, args.adj_margin, args.adj_plies))
+
+    out = args.out or os.path.join(RESULTS_DIR, time.strftime(f"{a['name']}-vs-{b['name']}-%Y%m%d-%H%M%S.jsonl"))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    print(f"[selfplay] {a['name']} vs {b['name']}: {args.games} games on {args.workers} workers -> {out}")
+
+    results = []
+    t0 = time.perf_counter()
+    with open(out, "w") as f, Pool(args.workers, initializer=_init_worker, initargs=(args.cache,)) as pool:
+        for r in pool.imap_unordered(play_game, jobs):
+            f.write(json.dumps(r) + "\n")
+            f.flush()
+            results.append(r)
+            print(f"[selfplay] game {r['game']:3d}  {r['white']} vs {r['black']}  "
+                  f"{r['result']:7s} ({r['reason']}, {r['plies']} plies)  "
+                  f"running score A {sum(x['score_a'] for x in results):.1f}/{len(results)}")
+
+    report = summarize(results, a, b)
+    report["elapsed_s"] = round(time.perf_counter() - t0, 1)
+    for k, v in report.items():
+        print(f"  {k:14s} {v}")
+    with open(out, "a") as f:
+        f.write(json.dumps({"summary": report}) + "\n")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--a", type=parse_config, default=parse_config("d2"), help="engine A, e.g. d2")
+    ap.add_argument("--b", type=parse_config, default=parse_config("d3"), help="engine B, e.g. d3")
+    ap.add_argument("--games", type=int, default=32)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--random-plies", type=int, default=4,
+                    help="random moves played after the book line, to vary the start")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--max-plies", type=int, default=200, help="games longer than this are drawn")
+    ap.add_argument("--adj-margin", type=int, default=900,
+                    help="material lead (centipawns) that counts as decisive")
+    ap.add_argument("--adj-plies", type=int, default=8,
+                    help="plies the lead must hold before the game is adjudicated")
+    ap.add_argument("--cache", action="store_true", help="let the engines use the on-disk position cache")
+    ap.add_argument("--out", help="JSONL results file (default selfplay/<a>-vs-<b>-<time>.jsonl)")
+    try:
+        main(ap.parse_args())
+    except KeyboardInterrupt:
+        sys.exit(1)
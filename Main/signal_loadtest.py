@@ -0,0 +1,250 @@
+# signal_loadtest.py
+"""Load generator for signal_server.
+
+Opens many simulated host/joiner websocket pairs against /ws?room=..., has
+them exchange offer/answer/candidate traffic shaped like chess_multiplayer's,
+and reports offered and achieved connections per second, relay latency,
+replay latency for late joiners, error rates and (with --pid) server memory.
+
+    python signal_server.py &
+    python signal_loadtest.py --rooms 2000 --late 0.3 --pid $!
+"""
+import os, sys, json, time, random, string, asyncio, argparse
+
+from aiohttp import ClientSession, TCPConnector, WSMsgType
+
+# Roughly the size of an aiortc data-channel-only SDP
+FAKE_SDP = "v=0\r\n" + "a=x-filler:" + "x" * 2400 + "\r\n"
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def rss_kb(pid):
+    """Resident memory of `pid` in KiB (Linux /proc), or None."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+def raise_fd_limit():
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except Exception:
+        pass
+
+def make_msgs(kind, n_candidates):
+    msgs = [{"type": kind, "sdp": FAKE_SDP}]
+    for i in range(n_candidates):
+        msgs.append({"type": "candidate", "candidate": {
+            "sdpMid": "0", "sdpMLineIndex": 0,
+            "candidate": f"candidate:{i} 1 udp {2130706431 - i} 192.168.1.{i % 250 + 1} {50000 + i} typ host",
+        }})
+    return msgs
+
+class Stats:
+    def __init__(self):
+        self.connects = 0
+        self.connect_errors = 0
+        self.connect_ms = []
+        self.first_attempt = None   # perf_counter() of the first connect attempt,
+        self.last_attempt = None    # the last one
+        self.last_connect = None    # and the last successful connect
+        self.relay_ms = []
+        self.replay_ms = []
+        self.sent = 0
+        self.received = 0
+        self.missing = 0
+        self.room_errors = 0
+        self.rss_peak = None
+
+class Client:
+    def __init__(self, ws, stats):
+        self.ws = ws
+        self.stats = stats
+        self.joined_at = time.perf_counter()
+        self.got = 0
+        self.done = asyncio.Event()
+        self.expect = None   # set by wait(); until then nothing can be "done"
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        async for msg in self.ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            now = time.perf_counter()
+            ts = json.loads(msg.data).get("ts", now)
+            if ts < self.joined_at:
+                # Sent before we connected: came from the server's replay cache
+                self.stats.replay_ms.append((now - self.joined_at) * 1000)
+            else:
+                self.stats.relay_ms.append((now - ts) * 1000)
+            self.stats.received += 1
+            self.got += 1
+            if self.expect is not None and self.got >= self.expect:
+                self.done.set()
+
+    async def send_all(self, msgs):
+        for m in msgs:
+            m["ts"] = time.perf_counter()
+            await self.ws.send_str(json.dumps(m))
+            self.stats.sent += 1
+
+    async def wait(self, expect, timeout):
+        self.expect = expect
+        self.done.clear()
+        if self.got >= expect:
+            return
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.stats.missing += expect - self.got
+
+    async def close(self):
+        await self.ws.close()
+        self.reader.cancel()
+
+async def connect(session, url, stats):
+    t0 = time.perf_counter()
+    if stats.first_attempt is None:
+        stats.first_attempt = t0
+    stats.last_attempt = t0
+    try:
+        ws = await session.ws_connect(url, heartbeat=20)
+    except Exception:
+        stats.connect_errors += 1
+        raise
+    done = time.perf_counter()
+    stats.connects += 1
+    stats.connect_ms.append((done - t0) * 1000)
+    stats.last_connect = done
+    return Client(ws, stats)
+
+async def run_room(session, base_url, args, stats, start_delay, hold_until):
+    await asyncio.sleep(start_delay)
+    room = "LT" + "".join(random.choice(string.ascii_uppercase) for _ in range(8))
+    url = f"{base_url}/ws?room={room}"
+    late = random.random() < args.late
+    # Live relay forwards everything; replay is bounded by the server's candidate cap
+    replay_expect = 1 + min(args.candidates, args.server_cap)
+    live_expect = 1 + args.candidates
+    clients = []
+    try:
+        host = await connect(session, url, stats); clients.append(host)
+        joiner = None
+        if not late:
+            joiner = await connect(session, url, stats); clients.append(joiner)
+
+        await host.send_all(make_msgs("offer", args.candidates))
+
+        if late:
+            # Join after the offer is cached: exercises the replay path
+            await asyncio.sleep(args.late_delay)
+            joiner = await connect(session, url, stats); clients.append(joiner)
+
+        await joiner.wait(replay_expect if late else live_expect, args.timeout)
+        await joiner.send_all(make_msgs("answer", args.candidates))
+        await host.wait(live_expect, args.timeout)
+
+        await asyncio.sleep(max(0.0, hold_until - time.perf_counter()))
+    except Exception:
+        stats.room_errors += 1
+    finally:
+        for c in clients:
+            try: await c.close()
+            except Exception: pass
+
+async def sample_rss(pid, stats, stop):
+    while not stop.is_set():
+        kb = rss_kb(pid)
+        if kb is not None:
+            stats.rss_peak = max(stats.rss_peak or 0, kb)
+        await asyncio.sleep(0.5)
+
+async def main(args):
+    raise_fd_limit()
+    base_url = f"ws://{args.host}:{args.port}"
+    stats = Stats()
+    rss_before = rss_kb(args.pid) if args.pid else None
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(args.pid, stats, stop)) if args.pid else None
+
+    print(f"[loadtest] {args.rooms} rooms against {base_url}, ramp {args.ramp}s, "
+          f"{int(args.late * 100)}% late joiners")
+    t0 = time.perf_counter()
+    hold_until = t0 + args.ramp + args.hold
+    async with ClientSession(connector=TCPConnector(limit=0)) as session:
+        await asyncio.gather(*[
+            run_room(session, base_url, args, stats, args.ramp * i / args.rooms, hold_until)
+            for i in range(args.rooms)
+        ])
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    if sampler:
+        await sampler
+
+    # Offered: attempts over the span they were made in. Achieved: successful
+    # connects from the first attempt to the last completion, which falls
+    # behind the offered rate once the server stops keeping up.
+    attempts = stats.connects + stats.connect_errors
+    attempt_span = (stats.last_attempt - stats.first_attempt) if attempts else 0
+    connect_window = (stats.last_connect - stats.first_attempt) if stats.connects else 0
+    expected = stats.sent
+    report = {
+        "rooms": args.rooms,
+        "elapsed_s": round(elapsed, 2),
+        "connections": stats.connects,
+        "offered_per_s": round(attempts / attempt_span, 1) if attempt_span > 0 else None,
+        "connections_per_s": round(stats.connects / connect_window, 1) if connect_window > 0 else 0.0,
+        "connect_ms_p50": round(percentile(stats.connect_ms, 50), 2),
+        "connect_ms_p99": round(percentile(stats.connect_ms, 99), 2),
+        "relay_ms_p50": round(percentile(stats.relay_ms, 50), 2),
+        "relay_ms_p99": round(percentile(stats.relay_ms, 99), 2),
+        "replay_ms_p50": round(percentile(stats.replay_ms, 50), 2),
+        "replay_ms_p99": round(percentile(stats.replay_ms, 99), 2),
+        "messages_sent": stats.sent,
+        "messages_received": stats.received,
+        "connect_error_rate": round(stats.connect_errors / max(1, stats.connects + stats.connect_errors), 4),
+        "room_error_rate": round(stats.room_errors / args.rooms, 4),
+        "missing_messages": stats.missing,
+        "missing_rate": round(stats.missing / max(1, expected), 4),
+    }
+    if args.pid:
+        report["server_rss_kb_before"] = rss_before
+        report["server_rss_kb_peak"] = stats.rss_peak
+        report["server_rss_kb_after"] = rss_kb(args.pid)
+
+    for k, v in report.items():
+        print(f"  {k:24s} {v}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[loadtest] wrote {args.json}")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default=os.getenv("SIGNAL_HOST", "127.0.0.1"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("SIGNAL_PORT", "8080")))
+    ap.add_argument("--rooms", type=int, default=1000)
+    ap.add_argument("--ramp", type=float, default=10.0, help="seconds over which rooms are started")
+    ap.add_argument("--hold", type=float, default=5.0, help="seconds to keep all rooms open after the ramp")
+    ap.add_argument("--late", type=float, default=0.3, help="fraction of rooms whose joiner arrives late")
+    ap.add_argument("--late-delay", type=float, default=0.2)
+    ap.add_argument("--candidates", type=int, default=4, help="candidates sent per peer")
+    ap.add_argument("--server-cap", type=int, default=int(os.getenv("MAX_CANDIDATES", "32")),
+                    help="server's MAX_CANDIDATES (limits what late joiners can receive)")
+    ap.add_argument("--timeout", type=float, default=10.0)
+    ap.add_argument("--pid", type=int, help="server pid, to sample its memory")
+    ap.add_argument("--json", help="also write the report to this file")
+    try:
+        asyncio.run(main(ap.parse_args()))
+    except KeyboardInterrupt:
+        sys.exit(1)
@@ -1,65 +1,778 @@
-import asyncio
-from aiohttp import web
-
-# Rooms => connected websockets
-rooms = {}        # dict[str, set[WebSocketResponse]]
-# Cache last signaling messages so late joiners can catch up
-last_msgs = {}    # dict[str, list[str]]
-
-async def ws_handler(request):
-    room = request.query.get("room")
-    if not room:
-        return web.Response(text="room query param required", status=400)
-
-    ws = web.WebSocketResponse(heartbeat=20)
-    await ws.prepare(request)
-
-    peers = rooms.setdefault(room, set())
-    peers.add(ws)
-    print(f"[room {room}] client joined ({len(peers)} in room)")
-
-    # Re-send cached messages (offer/answer + candidates) to late joiners
-    if room in last_msgs:
-        for msg in last_msgs[room]:
-            print(f"[room {room}] replaying cached: {msg[:60]}... to new peer")
-            await ws.send_str(msg)
-
-    try:
-        async for msg in ws:
-            if msg.type == web.WSMsgType.TEXT:
-                data = msg.data
-                print(
-                    f"[room {room}] received: {data[:80]}... "
-                    f"(from {id(ws)}) relaying to {len(peers)-1} peers"
-                )
-
-                # Cache: keep latest offer/answer, and append all candidates
-                buf = last_msgs.setdefault(room, [])
-                if '"type": "offer"' in data or '"type": "answer"' in data:
-                    buf.clear()
-                    buf.append(data)
-                elif '"type": "candidate"' in data:
-                    buf.append(data)
-
-                # Relay to everyone else in the room
-                for peer in list(peers):
-                    if peer is not ws:
-                        await peer.send_str(data)
-
-            elif msg.type == web.WSMsgType.ERROR:
-                print(f"[room {room}] ws closed with error: {ws.exception()}")
-    finally:
-        peers.discard(ws)
-        if not peers:
-            rooms.pop(room, None)
-            last_msgs.pop(room, None)
-        print(f"[room {room}] client left ({len(peers)} in room)")
-
-    return ws
-
-app = web.Application()
-app.add_routes([web.get("/ws", ws_handler)])
-
-if __name__ == "__main__":
-    print("[signal_server] starting on 0.0.0.0:8080")
-    web.run_app(app, host="0.0.0.0", port=8080)
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import signal
+from bisect import bisect_left
+from collections import OrderedDict, Counter, deque
+from aiohttp import web
+
+log = logging.getLogger("signal_server")
+
+# ---------- Cache limits ----------
+ROOM_TTL        = float(os.getenv("ROOM_TTL", "600"))          # seconds a room may sit idle
+MAX_CANDIDATES  = int(os.getenv("MAX_CANDIDATES", "32"))       # cached candidates per room
+MAX_TAIL_MOVES  = int(os.getenv("MAX_TAIL_MOVES", "48"))       # cached moves after a broadcast snapshot
+MAX_CACHE_BYTES = int(os.getenv("MAX_CACHE_BYTES", str(8 * 1024 * 1024)))  # all rooms together
+SWEEP_INTERVAL  = float(os.getenv("SWEEP_INTERVAL", "30"))
+
+# ---------- Per-peer outbound queues ----------
+SEND_QUEUE_MAX = int(os.getenv("SEND_QUEUE_MAX", "64"))
+# A spectator resync (snapshot + cached moves) must leave room in the queue
+# for the next live move, or the resync would immediately overflow again
+MAX_TAIL_MOVES = max(1, min(MAX_TAIL_MOVES, SEND_QUEUE_MAX - 2))
+# What to do when a peer's queue is full:
+#   "drop"       - drop the new message
+#   "coalesce"   - drop superseded/old candidates to make room
+#   "disconnect" - close the slow peer
+# Spectators always use "resync": their queue is replaced by the latest
+# snapshot and the moves after it.
+BACKPRESSURE = os.getenv("BACKPRESSURE", "coalesce").lower()
+
+# ---------- Multi-worker mode ----------
+WORKERS     = int(os.getenv("WORKERS", "1"))
+BROKER_PATH = os.getenv("BROKER_PATH", "/tmp/p2pchess_signal.sock")
+BUS_LINE_LIMIT = 1024 * 1024
+
+# ---------- Limits, logging & metrics ----------
+MAX_MSG_BYTES = int(os.getenv("MAX_MSG_BYTES", str(64 * 1024)))   # larger messages are rejected
+LOG_LEVEL     = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE    = int(os.getenv("LOG_SAMPLE", "100"))   # log 1 in N per-message debug lines
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+REPLAY_BUCKETS  = (0, 1, 2, 4, 8, 16, 32, 64)
+
+SDP_TYPES = ("offer", "answer")
+# A cached room is one "head" message plus the deltas sent after it:
+# offer/answer + candidates for signaling, snapshot + moves for broadcasts.
+HEAD_TYPES = SDP_TYPES + ("snapshot",)
+TAIL_CAPS  = {"candidate": MAX_CANDIDATES, "move": MAX_TAIL_MOVES}
+BROADCAST_TYPES = ("snapshot", "move")
+WATCH_PREFIX = "watch:"
+
+# Rooms => connected peers
+rooms = {}        # dict[str, set[Peer]]
+# Cache last signaling messages so late joiners can catch up (LRU order)
+last_msgs = OrderedDict()   # OrderedDict[str, RoomCache]
+cache_bytes = 0
+cache_counters = {"evicted_ttl": 0, "evicted_lru": 0, "dropped_candidates": 0, "dropped_moves": 0}
+send_counters = {"send_dropped": 0, "send_coalesced": 0, "send_disconnects": 0}
+
+# ====================== Logging & metrics ======================
+def setup_logging():
+    """Leveled logging whose handler runs on a background thread: the event
+    loop only pays for putting a record on a queue."""
+    q = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(process)d] %(message)s"))
+    listener = logging.handlers.QueueListener(q, handler)
+    listener.start()
+    # A forked broker or worker inherits the parent's handler, whose
+    # listener thread didn't come along: replace it rather than add a second
+    log.handlers = [logging.handlers.QueueHandler(q)]
+    log.setLevel(LOG_LEVEL)
+    log.propagate = False
+    return listener
+
+_sample_n = 0
+
+def log_sampled(msg, *args):
+    """Per-message debug line, emitted for 1 in LOG_SAMPLE calls."""
+    global _sample_n
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+    _sample_n += 1
+    if _sample_n % LOG_SAMPLE == 0:
+        log.debug(msg + f" (sampled 1/{LOG_SAMPLE})", *args)
+
+class Histogram:
+    """Fixed-bucket histogram rendered in Prometheus text format."""
+    __slots__ = ("buckets", "counts", "total", "n")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, v):
+        self.counts[bisect_left(self.buckets, v)] += 1
+        self.total += v
+        self.n += 1
+
+    def render(self, name, help_text):
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        acc = 0
+        for le, c in zip(self.buckets, self.counts):
+            acc += c
+            lines.append(f'{name}_bucket{{le="{le}"}} {acc}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.n}')
+        lines.append(f"{name}_sum {self.total}")
+        lines.append(f"{name}_count {self.n}")
+        return lines
+
+relayed = Counter()           # message type -> messages received for relay
+rejected = Counter()          # reason -> count
+relay_latency = Histogram(LATENCY_BUCKETS)   # enqueue -> written to the peer socket
+replay_sizes  = Histogram(REPLAY_BUCKETS)    # cached messages replayed per join
+broadcast_fanout = Histogram(LATENCY_BUCKETS)   # time to queue one move for every viewer
+broadcast_counters = {"spectators": 0, "deliveries": 0}
+publishers = set()            # games with a connected publisher (held by the broker with WORKERS > 1)
+_rate_snapshot = {"t": time.monotonic(), "counts": Counter()}
+
+def parse_signal(data):
+    """Classify a relayed message once. Returns its type, or None if it is
+    not a JSON object with a string "type" (still relayed, never cached)."""
+    try:
+        obj = json.loads(data)
+    except ValueError:
+        return None
+    typ = obj.get("type") if isinstance(obj, dict) else None
+    return typ if isinstance(typ, str) else None
+
+class RoomCache:
+    """Latest head message (offer/answer or snapshot) plus the deltas sent
+    after it (candidates or moves), for one room."""
+    __slots__ = ("head", "tail", "nbytes", "touched")
+
+    def __init__(self):
+        self.head = None   # (type, data)
+        self.tail = []     # [(type, data)]
+        self.nbytes = 0
+        self.touched = time.monotonic()
+
+    def add(self, typ, data):
+        """Store a message; returns the change in cached bytes."""
+        before = self.nbytes
+        if typ in HEAD_TYPES:
+            self.head = (typ, data)
+            self.tail.clear()
+            self.nbytes = len(data)
+        elif typ in TAIL_CAPS:
+            if len(self.tail) >= TAIL_CAPS[typ]:
+                cache_counters[f"dropped_{typ}s"] += 1
+                return 0
+            self.tail.append((typ, data))
+            self.nbytes += len(data)
+        return self.nbytes - before
+
+    def messages(self):
+        """Cached messages in replay order as (type, data) pairs."""
+        return ([self.head] if self.head else []) + self.tail
+
+def cache_put(room, typ, data):
+    global cache_bytes
+    if typ not in HEAD_TYPES and typ not in TAIL_CAPS:
+        return
+    entry = last_msgs.get(room)
+    if entry is None:
+        entry = last_msgs[room] = RoomCache()
+    last_msgs.move_to_end(room)
+    entry.touched = time.monotonic()
+    cache_bytes += entry.add(typ, data)
+    _enforce_ceiling(keep=room)
+
+def cache_drop(room):
+    global cache_bytes
+    entry = last_msgs.pop(room, None)
+    if entry is not None:
+        cache_bytes -= entry.nbytes
+
+def _enforce_ceiling(keep=None):
+    # Evict least recently used rooms until we are back under the ceiling;
+    # the room that was just written is the last one to go.
+    while cache_bytes > MAX_CACHE_BYTES and last_msgs:
+        room = next(iter(last_msgs))
+        if room == keep and len(last_msgs) == 1:
+            break
+        if room == keep:
+            last_msgs.move_to_end(room)
+            continue
+        cache_drop(room)
+        cache_counters["evicted_lru"] += 1
+        log.info("[cache] evicted room %s (memory ceiling)", room)
+
+def sweep_idle(now=None):
+    """Drop caches of rooms with no signaling traffic for ROOM_TTL seconds."""
+    now = time.monotonic() if now is None else now
+    # OrderedDict is in last-touched order, so stop at the first fresh room
+    while last_msgs:
+        room, entry = next(iter(last_msgs.items()))
+        if now - entry.touched < ROOM_TTL:
+            break
+        cache_drop(room)
+        cache_counters["evicted_ttl"] += 1
+        log.info("[cache] evicted room %s (idle %ds)", room, now - entry.touched)
+
+def cache_info():
+    """Replay cache figures of this process (the broker's in multi-worker mode)."""
+    return {
+        "cached_rooms": len(last_msgs),
+        "cached_messages": sum(len(e.tail) + (1 if e.head else 0) for e in last_msgs.values()),
+        "cache_bytes": cache_bytes,
+        "cache_limit_bytes": MAX_CACHE_BYTES,
+        **cache_counters,
+    }
+
+def cache_stats(cache=None):
+    """Peers on this process plus `cache` (default: this process's cache)."""
+    return {
+        "rooms": len(rooms),
+        "peers": sum(len(p) for p in rooms.values()),
+        **(cache if cache is not None else cache_info()),
+        **send_counters,
+    }
+
+class Peer:
+    """A connected websocket with its own bounded outbound queue and writer
+    task, so relaying to it never waits on its network."""
+    __slots__ = ("ws", "room", "policy", "queue", "wakeup", "task", "closing", "resyncing", "held")
+
+    def __init__(self, ws, room=None, policy=None):
+        self.ws = ws
+        self.room = room
+        self.policy = policy or BACKPRESSURE
+        self.queue = deque()   # (type, data, enqueued_at)
+        self.wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._writer())
+        self.closing = False
+        self.resyncing = False
+        # Live messages that arrive while the join replay is being fetched;
+        # they must go out after it (a candidate before its offer is lost)
+        self.held = []
+
+    def enqueue(self, typ, data):
+        if self.held is not None:
+            if len(self.held) >= SEND_QUEUE_MAX:
+                send_counters["send_dropped"] += 1
+                return False
+            self.held.append((typ, data))
+            return True
+        if len(self.queue) >= SEND_QUEUE_MAX and not self._make_room(typ):
+            return False
+        self.queue.append((typ, data, time.perf_counter()))
+        self.wakeup.set()
+        return True
+
+    def load(self, msgs, replace=False):
+        """Queue a replay as a whole. It bypasses SEND_QUEUE_MAX: the replay
+        is bounded by the cache caps, and must not trip the policy itself."""
+        now = time.perf_counter()
+        items = [(typ, data, now) for typ, data in msgs]
+        if replace:
+            self.queue = deque(items)
+        else:
+            self.queue.extend(items)
+        if self.queue:
+            self.wakeup.set()
+
+    def start(self, replay):
+        """Queue the join replay, then the live messages held back meanwhile.
+        A message relayed from another worker just before the join can be in
+        both; it is sent once."""
+        held, self.held = self.held, None
+        cached = {data for _, data in replay}
+        self.load(list(replay) + [m for m in held if m[1] not in cached])
+
+    def _make_room(self, typ):
+        if self.policy == "resync":
+            # A lagging spectator skips ahead to the latest snapshot
+            send_counters["send_coalesced"] += len(self.queue)
+            self.queue.clear()
+            if not self.resyncing:
+                self.resyncing = True
+                asyncio.create_task(self._resync())
+            return False
+        if self.policy == "disconnect":
+            if not self.closing:
+                self.closing = True
+                send_counters["send_disconnects"] += 1
+                log.warning("[peer %s] send queue full, disconnecting", id(self.ws))
+                asyncio.create_task(self.ws.close())
+            return False
+        if self.policy == "coalesce":
+            if typ in SDP_TYPES:
+                # A new offer/answer supersedes queued SDP and candidates
+                kept = deque(m for m in self.queue if m[0] not in SDP_TYPES and m[0] != "candidate")
+                n = len(self.queue) - len(kept)
+                self.queue = kept
+            else:
+                n = 0
+                for i, m in enumerate(self.queue):
+                    if m[0] == "candidate":
+                        del self.queue[i]
+                        n = 1
+                        break
+            if n:
+                send_counters["send_coalesced"] += n
+                if len(self.queue) < SEND_QUEUE_MAX:
+                    return True
+        send_counters["send_dropped"] += 1
+        return False
+
+    async def _writer(self):
+        try:
+            while True:
+                while not self.queue:
+                    self.wakeup.clear()
+                    await self.wakeup.wait()
+                _, data, t = self.queue.popleft()
+                await self.ws.send_str(data)
+                relay_latency.observe(time.perf_counter() - t)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            log.warning("[peer %s] send failed: %s", id(self.ws), e)
+
+    async def _resync(self):
+        try:
+            replay = await registry.replay(self.room)
+            # Anything queued while fetching is also in the replay
+            if not self.task.done():
+                self.load(replay, replace=True)
+        finally:
+            self.resyncing = False
+
+    def close(self):
+        self.task.cancel()
+
+def fan_out(room, typ, data, skip=None):
+    """Queue a message for every local peer in the room except `skip`."""
+    t0 = time.perf_counter()
+    n = 0
+    for peer in rooms.get(room, ()):
+        if peer is not skip:
+            peer.enqueue(typ, data)
+            n += 1
+    if typ in BROADCAST_TYPES:
+        broadcast_fanout.observe(time.perf_counter() - t0)
+        broadcast_counters["deliveries"] += n
+
+# ====================== Room registry ======================
+class LocalRegistry:
+    """Single-process registry: cache and membership live in this process."""
+
+    async def start(self, deliver):
+        pass
+
+    async def join(self, room):
+        return await self.replay(room)
+
+    async def replay(self, room):
+        entry = last_msgs.get(room)
+        return entry.messages() if entry else []
+
+    async def cache_info(self):
+        return cache_info()
+
+    async def claim_publisher(self, game):
+        """Register the game's one publisher; False if it already has one."""
+        if game in publishers:
+            return False
+        publishers.add(game)
+        return True
+
+    def release_publisher(self, game):
+        publishers.discard(game)
+
+    def publish(self, room, typ, data):
+        cache_put(room, typ, data)
+
+    def leave(self, room):
+        if room not in rooms:
+            cache_drop(room)
+
+class BrokerRegistry:
+    """Multi-worker registry: membership, the replay cache and cross-worker
+    relay live in the broker process, reached over a Unix socket.
+
+    Frames are newline-delimited JSON:
+      worker -> broker  {"op": "join"|"fetch"|"leave"|"pub", "room", ["id"], ["typ", "data"]}
+      worker -> broker  {"op": "stats", "room": "", "id"}
+      worker -> broker  {"op": "claim", "room": game, "id"} | {"op": "release", "room": game}
+      broker -> worker  {"op": "replay", "id", "msgs"} | {"op": "stats", "id", "stats"}
+                        | {"op": "claim", "id", "ok"} | {"op": "msg", "room", "typ", "data"}
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+        self.pending = {}   # request id -> Future for the reply frame
+        self.next_id = 0
+
+    async def start(self, deliver):
+        reader, self.writer = await asyncio.open_unix_connection(self.path, limit=BUS_LINE_LIMIT)
+        asyncio.create_task(self._read(reader, deliver))
+
+    def _send(self, frame):
+        self.writer.write(json.dumps(frame).encode() + b"\n")
+
+    async def _request(self, op, room):
+        self.next_id += 1
+        fut = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = fut
+        self._send({"op": op, "room": room, "id": self.next_id})
+        return await fut
+
+    async def join(self, room):
+        return [tuple(m) for m in (await self._request("join", room))["msgs"]]
+
+    async def replay(self, room):
+        return [tuple(m) for m in (await self._request("fetch", room))["msgs"]]
+
+    async def cache_info(self):
+        return (await self._request("stats", ""))["stats"]
+
+    async def claim_publisher(self, game):
+        return (await self._request("claim", game))["ok"]
+
+    def release_publisher(self, game):
+        self._send({"op": "release", "room": game})
+
+    def publish(self, room, typ, data):
+        self._send({"op": "pub", "room": room, "typ": typ, "data": data})
+
+    def leave(self, room):
+        self._send({"op": "leave", "room": room})
+
+    async def _read(self, reader, deliver):
+        async for line in reader:
+            frame = json.loads(line)
+            if frame["op"] in ("replay", "stats", "claim"):
+                fut = self.pending.pop(frame["id"], None)
+                if fut and not fut.done():
+                    fut.set_result(frame)
+            elif frame["op"] == "msg":
+                deliver(frame["room"], frame["typ"], frame["data"])
+        # Without the broker this worker can't reach the other workers' peers;
+        # stop rather than keep accepting rooms that can never meet
+        log.error("[bus] broker connection lost, stopping worker")
+        os.kill(os.getpid(), signal.SIGTERM)
+
+registry = LocalRegistry()
+
+# ====================== Handlers ======================
+async def ws_handler(request):
+    room = request.query.get("room")
+    if not room or room.startswith(WATCH_PREFIX):
+        rejected["no_room"] += 1
+        return web.Response(text="room query param required", status=400)
+    return await _serve_peer(request, room, "signal")
+
+async def publish_handler(request):
+    """The player who broadcasts a game: sends snapshot/move frames."""
+    game = request.query.get("game")
+    if not game:
+        rejected["no_room"] += 1
+        return web.Response(text="game query param required", status=400)
+    if not await registry.claim_publisher(game):
+        rejected["duplicate_publisher"] += 1
+        return web.Response(text="game already has a publisher", status=409)
+    try:
+        return await _serve_peer(request, WATCH_PREFIX + game, "publish")
+    finally:
+        registry.release_publisher(game)
+
+async def watch_handler(request):
+    """A spectator: gets the latest snapshot + moves on join, then deltas."""
+    game = request.query.get("game")
+    if not game:
+        rejected["no_room"] += 1
+        return web.Response(text="game query param required", status=400)
+    broadcast_counters["spectators"] += 1
+    try:
+        return await _serve_peer(request, WATCH_PREFIX + game, "watch")
+    finally:
+        broadcast_counters["spectators"] -= 1
+
+async def _serve_peer(request, room, role):
+    ws = web.WebSocketResponse(heartbeat=20)
+    await ws.prepare(request)
+
+    me = Peer(ws, room, "resync" if role == "watch" else None)
+    peers = rooms.setdefault(room, set())
+    peers.add(me)
+    log.info("[room %s] %s joined (%d in room)", room, "client" if role == "signal" else role, len(peers))
+
+    try:
+        # Re-send cached messages (offer/answer + candidates) to late joiners
+        replay = await registry.join(room)
+        replay_sizes.observe(len(replay))
+        me.start(replay)
+        if replay:
+            log_sampled("[room %s] replayed %d cached messages to new peer", room, len(replay))
+
+        async for msg in ws:
+            if msg.type == web.WSMsgType.TEXT:
+                if role == "watch":
+                    continue
+                data = msg.data
+                if len(data) > MAX_MSG_BYTES:
+                    rejected["oversized"] += 1
+                    log.warning("[room %s] dropped oversized message (%d bytes)", room, len(data))
+                    continue
+
+                # Cache (keep latest offer/answer, append candidates) and
+                # forward to peers of this room on other workers
+                typ = parse_signal(data)
+                if role == "publish" and typ not in BROADCAST_TYPES:
+                    rejected["bad_broadcast"] += 1
+                    continue
+                relayed[typ or "other"] += 1
+                log_sampled("[room %s] received %s (%d bytes), relaying to %d peers",
+                            room, typ, len(data), len(peers) - 1)
+                registry.publish(room, typ, data)
+
+                # Fan out to everyone else in the room without awaiting any of them
+                fan_out(room, typ, data, skip=me)
+
+            elif msg.type == web.WSMsgType.ERROR:
+                log.warning("[room %s] ws closed with error: %s", room, ws.exception())
+    finally:
+        me.close()
+        peers.discard(me)
+        if not peers:
+            rooms.pop(room, None)
+        registry.leave(room)
+        log.info("[room %s] client left (%d in room)", room, len(peers))
+
+    return ws
+
+async def stats_handler(request):
+    return web.json_response(cache_stats(await registry.cache_info()))
+
+def render_metrics(cache=None):
+    now = time.monotonic()
+    dt = max(now - _rate_snapshot["t"], 1e-9)
+    prev = _rate_snapshot["counts"]
+    _rate_snapshot["t"], _rate_snapshot["counts"] = now, relayed.copy()
+
+    stats = cache_stats(cache)
+    lines = [
+        "# HELP signal_rooms Rooms with at least one peer on this process",
+        "# TYPE signal_rooms gauge",
+        f"signal_rooms {stats['rooms']}",
+        "# HELP signal_peers Connected websockets on this process",
+        "# TYPE signal_peers gauge",
+        f"signal_peers {stats['peers']}",
+        "# HELP signal_cache_bytes Bytes held by the replay cache",
+        "# TYPE signal_cache_bytes gauge",
+        f"signal_cache_bytes {stats['cache_bytes']}",
+        "# HELP signal_cached_rooms Rooms with a replay cache",
+        "# TYPE signal_cached_rooms gauge",
+        f"signal_cached_rooms {stats['cached_rooms']}",
+        "# HELP signal_relayed_total Messages received for relay, by type",
+        "# TYPE signal_relayed_total counter",
+    ]
+    lines += [f'signal_relayed_total{{type="{t}"}} {n}' for t, n in sorted(relayed.items())]
+    lines += [
+        "# HELP signal_relayed_per_second Relay rate by type since the previous scrape",
+        "# TYPE signal_relayed_per_second gauge",
+    ]
+    lines += [f'signal_relayed_per_second{{type="{t}"}} {(n - prev[t]) / dt:.3f}'
+              for t, n in sorted(relayed.items())]
+    lines += [
+        "# HELP signal_rejected_total Rejected requests and messages, by reason",
+        "# TYPE signal_rejected_total counter",
+    ]
+    lines += [f'signal_rejected_total{{reason="{r}"}} {n}' for r, n in sorted(rejected.items())]
+    lines += [
+        "# HELP signal_backpressure_total Outbound queue overflow actions",
+        "# TYPE signal_backpressure_total counter",
+    ]
+    lines += [f'signal_backpressure_total{{action="{k[5:]}"}} {n}' for k, n in send_counters.items()]
+    lines += [
+        "# HELP signal_cache_evictions_total Replay cache evictions and dropped candidates",
+        "# TYPE signal_cache_evictions_total counter",
+    ]
+    lines += [f'signal_cache_evictions_total{{reason="{k}"}} {n}' for k, n in cache_counters.items()]
+    lines += [
+        "# HELP signal_spectators Connected spectators on this process",
+        "# TYPE signal_spectators gauge",
+        f"signal_spectators {broadcast_counters['spectators']}",
+        "# HELP signal_broadcast_deliveries_total Snapshot/move frames queued to viewers",
+        "# TYPE signal_broadcast_deliveries_total counter",
+        f"signal_broadcast_deliveries_total {broadcast_counters['deliveries']}",
+    ]
+    lines += broadcast_fanout.render("signal_broadcast_fanout_seconds",
+                                     "Time to queue one broadcast frame for all viewers "
+                                     "(sum / deliveries_total = cost per viewer)")
+    lines += relay_latency.render("signal_relay_latency_seconds",
+                                  "Time from enqueue to write on the receiving peer's socket")
+    lines += replay_sizes.render("signal_replay_messages", "Cached messages replayed to a joining peer")
+    return "\n".join(lines) + "\n"
+
+async def metrics_handler(request):
+    return web.Response(text=render_metrics(await registry.cache_info()), content_type="text/plain")
+
+async def _sweeper(app):
+    async def loop():
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            sweep_idle()
+    task = asyncio.create_task(loop())
+    yield
+    task.cancel()
+
+async def _start_registry(app):
+    await registry.start(fan_out)
+
+app = web.Application()
+app.add_routes([
+    web.get("/ws", ws_handler),
+    web.get("/stats", stats_handler),
+    web.get("/metrics", metrics_handler),
+    web.get("/publish", publish_handler),
+    web.get("/watch", watch_handler),
+])
+app.cleanup_ctx.append(_sweeper)
+app.on_startup.append(_start_registry)
+
+# ====================== Broker ======================
+bus_subs = {}     # dict[str, set[StreamWriter]] - workers with peers in a room
+bus_counts = {}   # dict[str, int] - peers in a room across all workers
+
+async def _broker_conn(reader, writer):
+    joined = {}      # room -> peers this worker has in it
+    claimed = set()  # games this worker has the publisher of
+
+    def leave(room):
+        joined[room] -= 1
+        if not joined[room]:
+            del joined[room]
+            bus_subs.get(room, set()).discard(writer)
+        bus_counts[room] -= 1
+        if not bus_counts[room]:
+            del bus_counts[room]
+            bus_subs.pop(room, None)
+            cache_drop(room)
+
+    try:
+        async for line in reader:
+            frame = json.loads(line)
+            op, room = frame["op"], frame["room"]
+            if op == "pub":
+                cache_put(room, frame["typ"], frame["data"])
+                out = json.dumps({"op": "msg", "room": room,
+                                  "typ": frame["typ"], "data": frame["data"]}).encode() + b"\n"
+                for w in bus_subs.get(room, ()):
+                    if w is not writer:
+                        w.write(out)
+            elif op in ("join", "fetch"):
+                if op == "join":
+                    joined[room] = joined.get(room, 0) + 1
+                    bus_counts[room] = bus_counts.get(room, 0) + 1
+                    bus_subs.setdefault(room, set()).add(writer)
+                entry = last_msgs.get(room)
+                msgs = entry.messages() if entry else []
+                writer.write(json.dumps({"op": "replay", "id": frame["id"], "msgs": msgs}).encode() + b"\n")
+            elif op == "stats":
+                writer.write(json.dumps({"op": "stats", "id": frame["id"], "stats": cache_info()}).encode() + b"\n")
+            elif op == "claim":
+                ok = room not in publishers
+                if ok:
+                    publishers.add(room)
+                    claimed.add(room)
+                writer.write(json.dumps({"op": "claim", "id": frame["id"], "ok": ok}).encode() + b"\n")
+            elif op == "release" and room in claimed:
+                claimed.discard(room)
+                publishers.discard(room)
+            elif op == "leave" and room in joined:
+                leave(room)
+    finally:
+        # Worker died: forget every peer and publisher it was holding
+        for room in list(joined):
+            while room in joined:
+                leave(room)
+        publishers.difference_update(claimed)
+        writer.close()
+
+def run_broker(path):
+    setup_logging()
+    parent = os.getppid()
+
+    async def main():
+        await asyncio.start_unix_server(_broker_conn, path, limit=BUS_LINE_LIMIT)
+        log.info("[broker] listening on %s", path)
+        swept = time.monotonic()
+        # Exit with the server process, even if it was killed outright; the
+        # workers follow when their broker connection drops
+        while os.getppid() == parent:
+            await asyncio.sleep(1)
+            if time.monotonic() - swept >= SWEEP_INTERVAL:
+                sweep_idle()
+                swept = time.monotonic()
+        log.warning("[broker] server process gone, exiting")
+    asyncio.run(main())
+
+def _broker_running(path):
+    """True if a broker is accepting connections on `path`."""
+    s = socket.socket(socket.AF_UNIX)
+    try:
+        s.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+def _run_worker(host, port, path):
+    global registry
+    registry = BrokerRegistry(path)
+    setup_logging()
+    log.info("[worker] serving on %s:%s", host, port)
+    web.run_app(app, host=host, port=port, reuse_port=True, print=None)
+
+def serve(host="0.0.0.0", port=8080, workers=WORKERS):
+    """Run the server. With workers > 1, start a broker plus `workers`
+    processes that share the port through SO_REUSEPORT."""
+    if workers <= 1 or not hasattr(socket, "SO_REUSEPORT"):
+        setup_logging()
+        if workers > 1:
+            log.warning("[signal_server] SO_REUSEPORT not available, running one process")
+        log.info("[signal_server] starting on %s:%s", host, port)
+        web.run_app(app, host=host, port=port)
+        return
+
+    listener = setup_logging()
+    if os.path.exists(BROKER_PATH):
+        if _broker_running(BROKER_PATH):
+            log.error("[signal_server] another server's broker is listening on %s; "
+                      "stop it first or set BROKER_PATH", BROKER_PATH)
+            listener.stop()
+            sys.exit(1)
+        os.unlink(BROKER_PATH)   # left behind by a server that didn't shut down
+    broker = multiprocessing.Process(target=run_broker, args=(BROKER_PATH,), daemon=True)
+    broker.start()
+    while not os.path.exists(BROKER_PATH):
+        time.sleep(0.05)
+
+    log.info("[signal_server] starting %d workers on %s:%s", workers, host, port)
+    procs = [multiprocessing.Process(target=_run_worker, args=(host, port, BROKER_PATH))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+    # systemd/docker stop and plain `kill` send SIGTERM: shut down the same
+    # way as on Ctrl+C so no worker keeps serving the port
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs + [broker]:
+            p.terminate()
+        for p in procs + [broker]:
+            p.join(5)
+        listener.stop()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    serve()
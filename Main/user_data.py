@@ -0,0 +1,28 @@
+# user_data.py
+"""Where files that must outlive a session are kept.
+
+Run from source, that is this folder (games/, profiles/ and the analysis
+cache sit next to the scripts). The one-file EXE unpacks to a temporary
+directory that is deleted when it exits, so there it is a per-user data
+directory instead:
+
+    Windows   %LOCALAPPDATA%\\P2PChess
+    macOS     ~/Library/Application Support/P2PChess
+    other     $XDG_DATA_HOME/p2pchess (default ~/.local/share/p2pchess)
+"""
+import os, sys
+
+APP_NAME = "P2PChess"
+
+def user_data_dir():
+    if not getattr(sys, "frozen", False):
+        return os.path.dirname(os.path.abspath(__file__))
+    if sys.platform == "win32":
+        base = os.getenv("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+        return os.path.join(base, APP_NAME)
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Application Support", APP_NAME)
+    base = os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, APP_NAME.lower())
+
+DATA_DIR = user_data_dir()